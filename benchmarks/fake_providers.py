@@ -0,0 +1,169 @@
+import random
+import struct
+import time
+from typing import Dict, Iterator, List, Optional
+from services.azure_service import AzureService
+from services.elevenlabs_service import ElevenLabsService
+from services import providers
+from services.metrics import timed
+from services.resilience import ProviderError, protected_call
+from utils.audio import build_wav
+
+# 16 kHz, 16-bit mono PCM, as Azure returns by default
+WAV_FORMAT = struct.pack('<HHIIHH', 1, 1, 16000, 32000, 2, 16)
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz frame header
+MP3_FRAME_HEADER = b'\xff\xfb\x90\x64'
+MP3_FRAME_SIZE = 417
+
+
+class FakeProvider:
+    """Simulated provider endpoint with configurable latency, jitter, error rate and audio size.
+
+    Every request sleeps for ``latency`` plus or minus up to ``jitter``
+    seconds and then fails with a transient ProviderError with probability
+    ``error_rate``, so retries and circuit breakers see realistic failures.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, error_rate: float = 0.0,
+                 audio_bytes: int = 64 * 1024, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.audio_bytes = audio_bytes
+        self._random = random.Random(seed)
+
+    def request(self, operation: str):
+        """Wait out one simulated round trip, failing at the configured rate"""
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(delay, 0.0))
+        if self._random.random() < self.error_rate:
+            raise ProviderError(f'Simulated {operation} failure', transient=True)
+
+    def wav(self, size: Optional[int] = None) -> bytes:
+        """Silent WAV audio with a data chunk of the given (or configured) size"""
+        size = self.audio_bytes if size is None else size
+        return build_wav(WAV_FORMAT, bytes(size - size % 2))
+
+    def mp3(self, size: Optional[int] = None) -> bytes:
+        """Silent-looking MP3 frames adding up to about the given (or configured) size"""
+        size = self.audio_bytes if size is None else size
+        frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+        return frame * max(1, size // MP3_FRAME_SIZE)
+
+
+def _chunks(data: bytes, chunk_size: int) -> Iterator[bytes]:
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+class FakeAzureService(AzureService):
+    """AzureService whose Speech SDK calls are answered by a FakeProvider.
+
+    Only the provider round trips are replaced: caching, chunking, packing,
+    rate limiting, retries and metrics all run as in production.
+    """
+
+    def __init__(self, provider: FakeProvider):
+        super().__init__()
+        self.provider = provider
+
+    def _call(self, operation: str, api_key: str, region: str, voice: str, respond):
+        def request():
+            self.provider.request(operation)
+            return respond()
+        return protected_call('azure', api_key, timed(request, 'azure', operation, region, voice), region)
+
+    def _synthesize_bytes(self, text: str, lang_code: str, voice: str,
+                          api_key: str, region: str, routing: Optional[List[Dict]] = None,
+                          output_format=None, hedge: bool = True) -> bytes:
+        return self._call('tts', api_key, region, voice, self.provider.wav)
+
+    def _synthesize_packed(self, texts: List[str], lang_code: str, voice: str,
+                           api_key: str, region: str, routing: Optional[List[Dict]] = None,
+                           output_format=None) -> List[bytes]:
+        return self._call('tts_packed', api_key, region, voice,
+                          lambda: [self.provider.wav() for _ in texts])
+
+    def stream_text_to_speech(self, text: str, language: str, voice_name: Optional[str],
+                              api_key: str, region: str) -> Iterator[bytes]:
+        voice = voice_name or self.voices.get(language, 'en-US-AriaNeural')
+        audio = self._call('tts_stream', api_key, region, voice, self.provider.mp3)
+        yield from _chunks(audio, 4096)
+
+    def speech_to_text(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
+        try:
+            text = self._call('stt', api_key, region, '', lambda: self._transcript(audio_path))
+            return {'success': True, 'text': text}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def speech_to_text_continuous(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
+        try:
+            segments = list(self.stream_speech_to_text(audio_path, language, api_key, region))
+            return {'success': True, 'text': ' '.join(segment['text'] for segment in segments), 'segments': segments}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def stream_speech_to_text(self, audio_path: str, language: str, api_key: str, region: str) -> Iterator[Dict]:
+        text = self._call('stt_continuous', api_key, region, '', lambda: self._transcript(audio_path))
+        yield {'text': text, 'start': 0.0, 'end': 0.0}
+
+    def speech_to_text_from_stream(self, stream, content_type: str, content_params: Dict,
+                                   language: str, api_key: str, region: str) -> Dict:
+        try:
+            size = 0
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                size += len(chunk)
+            text = self._call('stt_stream', api_key, region, '', lambda: f'{size} bytes of audio')
+            return {'success': True, 'text': text, 'segments': [{'text': text, 'start': 0.0, 'end': 0.0}]}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def fetch_voices(self, api_key: str, region: str) -> List[Dict]:
+        return self._call('voices', api_key, region, '', lambda: [
+            {'name': voice, 'display_name': voice.split('-')[-1], 'language': '-'.join(voice.split('-')[:2]),
+             'gender': 'Female', 'styles': []}
+            for voice in self.voices.values()
+        ])
+
+    @staticmethod
+    def _transcript(audio_path: str) -> str:
+        with open(audio_path, 'rb') as f:
+            size = len(f.read())
+        return f'{size} bytes of audio'
+
+
+class FakeElevenLabsService(ElevenLabsService):
+    """ElevenLabsService whose API calls are answered by a FakeProvider"""
+
+    def __init__(self, provider: FakeProvider):
+        super().__init__()
+        self.provider = provider
+
+    def _call(self, operation: str, api_key: str, voice: str, respond):
+        def request():
+            self.provider.request(operation)
+            return respond()
+        return protected_call('elevenlabs', api_key, timed(request, 'elevenlabs', operation, voice=voice))
+
+    def _synthesize_to_file(self, text: str, voice_id: str, api_key: str, filepath: str,
+                            audio_format: Dict) -> Dict:
+        respond = self.provider.wav if audio_format['container'] == 'wav' else self.provider.mp3
+        audio = self._call('tts', api_key, voice_id, respond)
+        with open(filepath, 'wb') as f:
+            f.write(audio)
+        return {'success': True}
+
+    def stream_text_to_speech(self, text: str, voice_name: Optional[str], api_key: str) -> Iterator[bytes]:
+        audio = self._call('tts_stream', api_key, voice_name or self.default_voice_id, self.provider.mp3)
+        yield from _chunks(audio, 2048)
+
+    def fetch_voices(self, api_key: str) -> List[Dict]:
+        return self._call('voices', api_key, '', self.get_available_voices)
+
+
+def install(azure_service: AzureService, elevenlabs_service: ElevenLabsService):
+    """Swap the shared provider services used by the app and its batch service for the given ones"""
+    providers.set_provider('azure', azure_service)
+    providers.set_provider('elevenlabs', elevenlabs_service)
@@ -0,0 +1,253 @@
+"""Offline benchmarks for the Orato API against simulated providers.
+
+Requests go through the real Flask app in process, with the Azure and
+ElevenLabs services swapped for fakes (see ``fake_providers``), so no
+provider quota is spent. Run from the repository root:
+
+    python -m benchmarks.run --scenario all --requests 200 --concurrency 16
+
+Each scenario reports p50/p99 latency, throughput, and the peak RSS
+while it ran along with how far that rose above the RSS at its start.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SCENARIOS = ['tts', 'tts-cached', 'tts-stream', 'stt', 'batch', 'download']
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def rss_mb() -> float:
+    """Get the current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    """Sample the process RSS on a background thread, tracking the peak while running"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = self.peak_mb = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='benchmark-rss', daemon=True)
+
+    def __enter__(self) -> 'RssSampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, rss_mb())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+
+def measure(name: str, count: int, concurrency: int, request: Callable[[int], int]) -> Dict:
+    """Run ``request(index)`` count times on concurrency threads.
+
+    Each request returns the number of work units it completed (0 on
+    failure), so batch jobs can report items per second.
+    """
+    latencies = []
+    units = []
+
+    def timed_request(index: int):
+        started = time.perf_counter()
+        try:
+            done = request(index)
+        except Exception as e:
+            print(f'  {name} request {index} raised: {e}', file=sys.stderr)
+            done = 0
+        latencies.append(time.perf_counter() - started)
+        units.append(done)
+
+    # Memory is sampled from the process RSS while the scenario runs, since
+    # the process-wide peak would carry over from earlier scenarios, and
+    # tracing allocations would slow every request
+    started = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_request, range(count)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'scenario': name,
+        'requests': count,
+        'errors': sum(1 for done in units if not done),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'rps': round(count / elapsed, 1),
+        'units_per_second': round(sum(units) / elapsed, 1),
+        'peak_rss_mb': round(rss.peak_mb, 1),
+        'rss_growth_mb': round(rss.peak_mb - rss.start_mb, 1)
+    }
+
+
+class Scenarios:
+    """Workloads driven through the Flask test client"""
+
+    def __init__(self, app_module, provider: str, args: argparse.Namespace):
+        self.app = app_module.app
+        self.provider = provider
+        self.args = args
+        self.api_key = 'benchmark-key'
+        self.region = 'eastus'
+
+    def client(self):
+        return self.app.test_client()
+
+    def tts_payload(self, text: str) -> Dict:
+        return {'text': text, 'provider': self.provider, 'api_key': self.api_key, 'region': self.region}
+
+    def tts(self, index: int) -> int:
+        # Unique texts, so every request misses the cache
+        response = self.client().post('/api/tts', json=self.tts_payload(f'Benchmark sentence {uuid.uuid4().hex}.'))
+        return int(response.status_code == 200)
+
+    def tts_cached(self, index: int) -> int:
+        response = self.client().post('/api/tts', json=self.tts_payload('The same benchmark sentence.'))
+        return int(response.status_code == 200)
+
+    def tts_stream(self, index: int) -> int:
+        response = self.client().post('/api/tts/stream',
+                                      json=self.tts_payload(f'Streamed sentence {uuid.uuid4().hex}.'))
+        try:
+            return int(response.status_code == 200 and len(response.get_data()) > 0)
+        finally:
+            response.close()
+
+    def stt(self, index: int) -> int:
+        from benchmarks.fake_providers import FakeProvider
+        audio = FakeProvider(audio_bytes=self.args.audio_size).wav()
+        response = self.client().post('/api/stt', content_type='multipart/form-data', data={
+            'audio': (io.BytesIO(audio), 'benchmark.wav'),
+            'api_key': self.api_key,
+            'region': self.region
+        })
+        return int(response.status_code == 200)
+
+    def batch(self, index: int) -> int:
+        """Submit one batch job and wait for it, counting its successful items"""
+        items = {f'item_{n}': f'Batch item {n} {uuid.uuid4().hex}.' for n in range(self.args.batch_size)}
+        client = self.client()
+        response = client.post('/api/batch', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(json.dumps(items).encode('utf-8')), 'batch.json'),
+            'provider': self.provider,
+            'api_key': self.api_key,
+            'region': self.region,
+            'pack': str(self.args.pack).lower()
+        })
+        if response.status_code != 202:
+            return 0
+        status_url = response.get_json()['status_url']
+        while True:
+            job = client.get(status_url).get_json()
+            if job['status'] in ('completed', 'failed'):
+                # processed only counts items that succeeded
+                return job['progress']['processed']
+            time.sleep(0.01)
+
+    def prepare_download(self) -> str:
+        response = self.client().post('/api/tts', json=self.tts_payload('Benchmark download.'))
+        if response.status_code != 200:
+            raise RuntimeError(f'Could not create a file to download: {response.get_json()}')
+        return response.get_json()['download_url']
+
+    def download(self, url: str) -> Callable[[int], int]:
+        def request(index: int) -> int:
+            response = self.client().get(url)
+            try:
+                return int(response.status_code == 200 and len(response.get_data()) > 0)
+            finally:
+                response.close()
+        return request
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Orato API against simulated providers')
+    parser.add_argument('--scenario', choices=SCENARIOS + ['all'], default='all')
+    parser.add_argument('--provider', choices=['azure', 'elevenlabs'], default='azure')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--latency', type=float, default=0.2, help='provider latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='provider latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of provider calls that fail')
+    parser.add_argument('--audio-size', type=int, default=64 * 1024, help='audio bytes per provider response')
+    parser.add_argument('--batch-size', type=int, default=50, help='items per batch job')
+    parser.add_argument('--batch-jobs', type=int, default=4, help='batch jobs to run')
+    parser.add_argument('--pack', action='store_true', help='pack short Azure batch items into SSML requests')
+    parser.add_argument('--rate-limits', action='store_true', help='keep the configured provider rate limits')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    args = parser.parse_args(argv)
+
+    # The app keeps uploads, downloads and jobs relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='orato-bench-')
+    os.chdir(workdir)
+
+    import app as app_module
+    from benchmarks.fake_providers import FakeAzureService, FakeElevenLabsService, FakeProvider, install
+    from services.rate_limiter import rate_limiter
+
+    fake = FakeProvider(args.latency, args.jitter, args.error_rate, args.audio_size, args.seed)
+    install(FakeAzureService(fake), FakeElevenLabsService(fake))
+    if not args.rate_limits:
+        rate_limiter.limits = {}
+
+    scenarios = Scenarios(app_module, args.provider, args)
+    selected = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    if args.provider != 'azure' and 'stt' in selected:
+        selected.remove('stt')  # Only Azure supports STT
+
+    results = []
+    for name in selected:
+        if name == 'batch':
+            result = measure(name, args.batch_jobs, min(args.concurrency, args.batch_jobs), scenarios.batch)
+        elif name == 'download':
+            result = measure(name, args.requests, args.concurrency, scenarios.download(scenarios.prepare_download()))
+        else:
+            result = measure(name, args.requests, args.concurrency, getattr(scenarios, name.replace('-', '_')))
+        results.append(result)
+        if args.json:
+            print(json.dumps(result))
+
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if not args.json:
+        columns = ['scenario', 'requests', 'errors', 'p50_ms', 'p99_ms', 'rps', 'units_per_second',
+                   'peak_rss_mb', 'rss_growth_mb']
+        print('  '.join(f'{column:>16}' for column in columns))
+        for result in results:
+            print('  '.join(f'{result[column]:>16}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
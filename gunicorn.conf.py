@@ -0,0 +1,35 @@
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+# Provider calls spend their time waiting on the network, so each worker
+# serves requests on a pool of threads; a container holds up to
+# workers * threads calls in flight. Async workers (gevent, eventlet) are
+# not supported: the Azure Speech SDK does its I/O on native threads that
+# monkey-patching cannot see, so its blocking waits stall the whole worker.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '64'))
+
+
+def on_starting(server):
+    if worker_class in ('gevent', 'eventlet'):
+        server.log.warning('%s workers block on Azure Speech SDK calls; use gthread', worker_class)
+
+    # Samples left over from a previous run would be summed into the new one
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that has gone away
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
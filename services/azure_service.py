@@ -1,9 +1,34 @@
 import azure.cognitiveservices.speech as speechsdk
-import os
-import uuid
-from typing import Dict, List, Optional
+import queue
+import struct
+from typing import Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+from services.batch_executor import synthesize_chunks
+from services.metrics import record_audio_bytes, register_voices, timed, track_provider_call
+from services.rate_limiter import ThrottledError, rate_limiter
+from services.resilience import ProviderError, get_guard, protected_call
+from services.region_router import AUTO_REGION, region_router
+from services.speech_pool import speech_pool
+from services.tts_cache import tts_cache
+from utils.audio import read_wav_header, split_wav
+from utils.audio_formats import AudioFormatError, concat_audio, get_audio_format
+from utils.config import Config
+from utils.text_chunker import split_text
 
 class AzureService:
+    STREAM_CHUNK_SIZE = 4096
+    RECOGNITION_IDLE_TIMEOUT = 60  # seconds without any recognizer event
+    
+    # Cancellations worth retrying; anything else (authentication, bad
+    # requests, quota) fails the same way on every attempt
+    TRANSIENT_ERROR_CODES = {
+        speechsdk.CancellationErrorCode.ConnectionFailure,
+        speechsdk.CancellationErrorCode.ServiceTimeout,
+        speechsdk.CancellationErrorCode.ServiceError,
+        speechsdk.CancellationErrorCode.ServiceUnavailable,
+        speechsdk.CancellationErrorCode.ServiceRedirectTemporary
+    }
+
     def __init__(self):
         self.languages = {
             'en': 'en-US',
@@ -36,51 +61,250 @@ class AzureService:
             'ko': 'ko-KR-SunHiNeural',
             'zh': 'zh-CN-XiaoxiaoNeural'
         }
+        register_voices(self.voices.values())
 
     def text_to_speech(self, text: str, language: str, voice_name: Optional[str], 
-                      api_key: str, region: str) -> Dict:
+                      api_key: str, region: str, output_format: Optional[str] = None) -> Dict:
         """Convert text to speech using Azure Cognitive Services"""
         try:
-            # Configure Azure Speech
-            speech_config = speechsdk.SpeechConfig(subscription=api_key, region=region)
-            
-            # Set language
-            speech_config.speech_synthesis_language = self.languages.get(language, 'en-US')
+            lang_code = self.languages.get(language, 'en-US')
+            voice = voice_name if voice_name else self.voices.get(language, 'en-US-AriaNeural')
+            audio_format = get_audio_format(output_format, 'azure')
             
-            # Set voice
-            if voice_name:
-                speech_config.speech_synthesis_voice_name = voice_name
-            else:
-                speech_config.speech_synthesis_voice_name = self.voices.get(language, 'en-US-AriaNeural')
-            
-            # Generate unique filename
-            filename = f"azure_tts_{uuid.uuid4().hex}.wav"
-            filepath = os.path.join('downloads', filename)
+            return tts_cache.get_or_create(
+                'azure', voice, lang_code, text, audio_format['extension'],
+                lambda filepath: self._synthesize_to_file(text, lang_code, voice, api_key, region, filepath,
+                                                          audio_format),
+                output_format=audio_format['name']
+            )
+                
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _synthesize_to_file(self, text: str, lang_code: str, voice: str,
+                            api_key: str, region: str, filepath: str, audio_format: Dict) -> Dict:
+        """Synthesize text into the given file, splitting long texts into chunks"""
+        chunks = split_text(text, Config.TTS_CHUNK_CHARS)
+        output_format = self._output_format(audio_format)
+        routing = []
+        
+        if len(chunks) <= 1:
+            audio = self._synthesize_bytes(text, lang_code, voice, api_key, region, routing, output_format)
+        else:
+            # Synthesize chunks concurrently and join them in order; chunks
+            # are long by construction, so they are not hedged
+            parts = synthesize_chunks(chunks, lambda chunk: self._synthesize_bytes(
+                chunk, lang_code, voice, api_key, region, routing, output_format, hedge=False
+            ), Config.TTS_CHUNK_WORKERS)
+            audio = concat_audio(audio_format, parts)
+        
+        return self._write_audio(filepath, audio, routing)
+
+    def text_to_speech_packed(self, texts: List[str], language: str, voice_name: Optional[str],
+                              api_key: str, region: str, output_format: Optional[str] = None) -> List[Dict]:
+        """Synthesize several short texts in a single request, returning one result per text.
+
+        The texts are sent as one SSML document with a bookmark before each,
+        and the audio is split at the bookmark offsets, so the output format
+        must be WAV. Texts already in the cache are not synthesized again.
+        """
+        try:
+            lang_code = self.languages.get(language, 'en-US')
+            voice = voice_name if voice_name else self.voices.get(language, 'en-US-AriaNeural')
+            audio_format = get_audio_format(output_format, 'azure')
+            if audio_format['container'] != 'wav':
+                raise AudioFormatError('Packed synthesis needs a WAV output format')
+            extension, format_name = audio_format['extension'], audio_format['name']
             
-            # Configure audio output
-            audio_config = speechsdk.audio.AudioOutputConfig(filename=filepath)
+            results = [tts_cache.lookup('azure', voice, lang_code, text, extension, format_name) for text in texts]
+            missing = [index for index, result in enumerate(results) if result is None]
+            if not missing:
+                return results
             
-            # Create synthesizer
-            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
+            routing = []
+            clips = self._synthesize_packed([texts[index] for index in missing], lang_code, voice,
+                                            api_key, region, routing, self._output_format(audio_format))
+            for index, clip in zip(missing, clips):
+                results[index] = tts_cache.get_or_create(
+                    'azure', voice, lang_code, texts[index], extension,
+                    lambda filepath, clip=clip: self._write_audio(filepath, clip, routing),
+                    output_format=format_name
+                )
+            return results
+                
+        except Exception as e:
+            return [{'success': False, 'error': str(e)} for _ in texts]
+
+    def _synthesize_packed(self, texts: List[str], lang_code: str, voice: str,
+                           api_key: str, region: str, routing: Optional[List[Dict]] = None,
+                           output_format=None) -> List[bytes]:
+        """Synthesize texts as one SSML document and split the WAV audio per text"""
+        if region == AUTO_REGION:
+            # A pack takes as long as all its texts, so it is never hedged
+            return self._route(lambda key, routed_region: self._synthesize_packed(
+                texts, lang_code, voice, key, routed_region, output_format=output_format
+            ), routing, hedge=False)
+        
+        ssml = self._build_packed_ssml(texts, lang_code, voice)
+        offsets = {}
+        
+        def on_bookmark(evt):
+            offsets[evt.text] = evt.audio_offset
+        
+        def synthesize():
+            offsets.clear()
+            with speech_pool.synthesizer(api_key, region, lang_code, voice, output_format) as synthesizer:
+                # Pooled synthesizers are reused, so handlers must not outlive this request
+                synthesizer.bookmark_reached.connect(on_bookmark)
+                try:
+                    result = synthesizer.speak_ssml_async(ssml).get()
+                finally:
+                    synthesizer.bookmark_reached.disconnect_all()
             
-            # Synthesize
-            result = synthesizer.speak_text_async(text).get()
+            if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+                raise self._synthesis_error(result)
+            return result
+        
+        result = protected_call('azure', api_key, timed(synthesize, 'azure', 'tts_packed', region, voice), region)
+        record_audio_bytes('azure', 'tts_packed', len(result.audio_data))
+        
+        starts = [offsets.get(str(index)) for index in range(len(texts))]
+        if None in starts:
+            raise RuntimeError(f'Expected {len(texts)} bookmarks, received {len(offsets)}')
+        
+        # Bookmark offsets are in 100-nanosecond ticks
+        return split_wav(result.audio_data, [ticks / 10_000_000 for ticks in starts])
+
+    @staticmethod
+    def _build_packed_ssml(texts: List[str], lang_code: str, voice: str) -> str:
+        """Build an SSML document with each text in its own paragraph, preceded by a bookmark"""
+        body = ''.join(f'<bookmark mark="{index}"/><p>{escape(text)}</p>' for index, text in enumerate(texts))
+        return (
+            f'<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang={quoteattr(lang_code)}>'
+            f'<voice name={quoteattr(voice)}>{body}</voice>'
+            '</speak>'
+        )
+
+    @staticmethod
+    def _output_format(audio_format: Dict):
+        """Get the Speech SDK output format for an audio format"""
+        return getattr(speechsdk.SpeechSynthesisOutputFormat, audio_format['azure'])
+
+    @staticmethod
+    def _write_audio(filepath: str, audio: bytes, routing: Optional[List[Dict]] = None) -> Dict:
+        with open(filepath, 'wb') as f:
+            f.write(audio)
+        if routing:
+            return {'success': True, 'routing': routing}
+        return {'success': True}
+
+    @staticmethod
+    def _route(operation, routing: Optional[List[Dict]] = None, hedge: bool = True):
+        """Run operation(api_key, region) in the regions picked by the router, recording its decision"""
+        value, decision = region_router.call(operation, hedge)
+        if routing is not None:
+            routing.append(decision)
+        return value
+
+    def _route_result(self, operation, hedge: bool = True) -> Dict:
+        """Route an operation returning a result dict, failing over only when it raises a regional error.
+
+        An unsuccessful result (such as no speech recognized) would be the
+        same in every region, so it is returned as is.
+        """
+        try:
+            routing = []
+            result = self._route(operation, routing, hedge)
+            return {**result, 'routing': routing}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _synthesize_bytes(self, text: str, lang_code: str, voice: str,
+                          api_key: str, region: str, routing: Optional[List[Dict]] = None,
+                          output_format=None, hedge: bool = True) -> bytes:
+        """Synthesize text and return the audio (WAV unless another output format is given)"""
+        if region == AUTO_REGION:
+            return self._route(lambda key, routed_region: self._synthesize_bytes(
+                text, lang_code, voice, key, routed_region, output_format=output_format
+            ), routing, hedge)
+        
+        def synthesize():
+            # Synthesize in memory on a pooled, pre-connected synthesizer
+            with speech_pool.synthesizer(api_key, region, lang_code, voice, output_format) as synthesizer:
+                result = synthesizer.speak_text_async(text).get()
             
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                return {'success': True, 'filename': filename}
+                return result.audio_data
             else:
-                return {'success': False, 'error': f'Synthesis failed: {result.reason}'}
-                
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+                raise self._synthesis_error(result)
+        
+        audio = protected_call('azure', api_key, timed(synthesize, 'azure', 'tts', region, voice), region)
+        record_audio_bytes('azure', 'tts', len(audio))
+        return audio
+
+    @staticmethod
+    def _synthesis_error(result) -> Exception:
+        """Build the error for a synthesis result that did not complete"""
+        if result.reason == speechsdk.ResultReason.Canceled:
+            return AzureService._cancellation_error('Synthesis', result.cancellation_details)
+        return RuntimeError(f'Synthesis failed: {result.reason}')
+
+    @staticmethod
+    def _cancellation_error(operation: str, details) -> Exception:
+        """Build the error for a canceled request, classified for backoff and retries"""
+        message = f'{operation} failed: {details.reason} {details.error_details or ""}'.strip()
+        if details.error_code == speechsdk.CancellationErrorCode.TooManyRequests:
+            return ThrottledError(message)
+        return ProviderError(message, transient=details.error_code in AzureService.TRANSIENT_ERROR_CODES)
+
+    def stream_text_to_speech(self, text: str, language: str, voice_name: Optional[str],
+                              api_key: str, region: str) -> Iterator[bytes]:
+        """Synthesize text as MP3 and yield audio chunks as they arrive"""
+        lang_code = self.languages.get(language, 'en-US')
+        voice = voice_name if voice_name else self.voices.get(language, 'en-US-AriaNeural')
+        output_format = speechsdk.SpeechSynthesisOutputFormat.Audio24Khz48KBitRateMonoMp3
+        
+        # The lease and rate limit slot are held until the stream is fully read;
+        # a client that disconnects early causes the synthesizer to be discarded
+        with rate_limiter.acquire('azure', api_key), \
+                speech_pool.synthesizer(api_key, region, lang_code, voice, output_format) as synthesizer:
+            def start():
+                result = synthesizer.start_speaking_text_async(text).get()
+                if result.reason == speechsdk.ResultReason.Canceled:
+                    raise self._synthesis_error(result)
+                return result
+            
+            # Only starting the stream is retried; audio already sent cannot be taken back
+            result = get_guard('azure', region).call(timed(start, 'azure', 'tts_stream', region, voice))
+            
+            stream = speechsdk.AudioDataStream(result)
+            buffer = bytes(self.STREAM_CHUNK_SIZE)
+            while True:
+                size = stream.read_data(buffer)
+                if size == 0:
+                    break
+                yield buffer[:size]
+            
+            if stream.status == speechsdk.StreamStatus.Canceled:
+                raise self._cancellation_error('Synthesis', stream.cancellation_details)
 
     def speech_to_text(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
         """Convert speech to text using Azure Cognitive Services"""
+        if region == AUTO_REGION:
+            return self._route_result(lambda key, routed_region: self._recognize_once(audio_path, language,
+                                                                                      key, routed_region))
+        
         try:
-            # Configure Azure Speech
-            speech_config = speechsdk.SpeechConfig(subscription=api_key, region=region)
-            speech_config.speech_recognition_language = self.languages.get(language, 'en-US')
-            
+            return self._recognize_once(audio_path, language, api_key, region)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _recognize_once(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
+        """Recognize a single utterance, raising if the request itself fails"""
+        # Configure Azure Speech
+        speech_config = speech_pool.recognition_config(api_key, region, self.languages.get(language, 'en-US'))
+        
+        def recognize():
             # Configure audio input
             audio_config = speechsdk.audio.AudioConfig(filename=audio_path)
             
@@ -89,15 +313,225 @@ class AzureService:
             
             # Recognize
             result = speech_recognizer.recognize_once_async().get()
+            if result.reason == speechsdk.ResultReason.Canceled:
+                raise self._cancellation_error('Recognition', result.cancellation_details)
+            return result
+        
+        result = protected_call('azure', api_key, timed(recognize, 'azure', 'stt', region), region)
+        
+        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            return {'success': True, 'text': result.text}
+        else:
+            return {'success': False, 'error': f'Recognition failed: {result.reason}'}
+
+    def speech_to_text_continuous(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
+        """Transcribe a whole audio file using continuous recognition"""
+        if region == AUTO_REGION:
+            # Long-form transcription runs for as long as the audio, so it is never hedged
+            return self._route_result(lambda key, routed_region: self._transcribe(audio_path, language,
+                                                                                  key, routed_region),
+                                      hedge=False)
+        
+        try:
+            return self._transcribe(audio_path, language, api_key, region)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _transcribe(self, audio_path: str, language: str, api_key: str, region: str) -> Dict:
+        """Transcribe a whole audio file, raising if the request fails"""
+        def transcribe():
+            audio_config = speechsdk.audio.AudioConfig(filename=audio_path)
+            speech_recognizer, events = self._start_continuous_recognition(audio_config, language, api_key, region)
+            return list(self._iter_recognized(speech_recognizer, events))
+        
+        # The file can be read again, so the whole session is retried on transient failures
+        with track_provider_call('azure', 'stt_continuous', region):
+            segments = protected_call('azure', api_key, transcribe, region, hold_slot=False)
+        return {
+            'success': True,
+            'text': ' '.join(segment['text'] for segment in segments),
+            'segments': segments
+        }
+
+    def speech_to_text_from_stream(self, stream, content_type: str, content_params: Dict,
+                                   language: str, api_key: str, region: str) -> Dict:
+        """Transcribe audio read from a byte stream without staging it on disk.
+
+        Audio is pushed into the recognizer while it is still being read, so
+        recognition overlaps with the upload.
+        """
+        try:
+            stream_format, head = self._push_stream_format(stream, content_type, content_params)
+            push_stream = speechsdk.audio.PushAudioInputStream(stream_format)
+            speech_recognizer, events = self._start_guarded(lambda: speechsdk.audio.AudioConfig(stream=push_stream),
+                                                            language, api_key, region)
             
-            if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                return {'success': True, 'text': result.text}
-            else:
-                return {'success': False, 'error': f'Recognition failed: {result.reason}'}
+            try:
+                total = len(head)
+                if head:
+                    push_stream.write(head)
+                while True:
+                    chunk = stream.read(Config.STT_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if total > Config.MAX_FILE_SIZE:
+                        raise ValueError('Audio stream exceeds maximum upload size')
+                    push_stream.write(chunk)
+            except BaseException:
+                speech_recognizer.stop_continuous_recognition_async().get()
+                raise
+            finally:
+                push_stream.close()
+            
+            with track_provider_call('azure', 'stt_stream', region):
+                segments = list(self._iter_guarded(speech_recognizer, events, region))
+            return {
+                'success': True,
+                'text': ' '.join(segment['text'] for segment in segments),
+                'segments': segments
+            }
                 
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def _push_stream_format(self, stream, content_type: str, content_params: Dict):
+        """Work out the push stream format for an upload, returning it with any bytes already read"""
+        if content_type in ('audio/wav', 'audio/wave', 'audio/x-wav'):
+            fmt, head = read_wav_header(stream)
+            if struct.unpack('<H', fmt[:2])[0] != 1:
+                raise ValueError('Only PCM WAV audio can be streamed')
+            channels, samples_per_second = struct.unpack('<HI', fmt[2:8])
+            bits_per_sample = struct.unpack('<H', fmt[14:16])[0]
+            return speechsdk.audio.AudioStreamFormat(
+                samples_per_second=samples_per_second,
+                bits_per_sample=bits_per_sample,
+                channels=channels
+            ), head
+        
+        if content_type in ('audio/l16', 'audio/pcm'):
+            return speechsdk.audio.AudioStreamFormat(
+                samples_per_second=int(content_params.get('rate', 16000)),
+                bits_per_sample=16,
+                channels=int(content_params.get('channels', 1))
+            ), b''
+        
+        # Compressed input is decoded by the SDK (requires GStreamer)
+        compressed_formats = {
+            'audio/mpeg': speechsdk.AudioStreamContainerFormat.MP3,
+            'audio/mp3': speechsdk.AudioStreamContainerFormat.MP3,
+            'audio/ogg': speechsdk.AudioStreamContainerFormat.OGG_OPUS,
+            'audio/flac': speechsdk.AudioStreamContainerFormat.FLAC,
+            'audio/x-flac': speechsdk.AudioStreamContainerFormat.FLAC,
+            'audio/alaw': speechsdk.AudioStreamContainerFormat.ALAW,
+            'audio/mulaw': speechsdk.AudioStreamContainerFormat.MULAW
+        }
+        if content_type in compressed_formats:
+            return speechsdk.audio.AudioStreamFormat(compressed_stream_format=compressed_formats[content_type]), b''
+        
+        raise ValueError(f'Unsupported audio content type: {content_type}')
+
+    def stream_speech_to_text(self, audio_path: str, language: str, api_key: str, region: str) -> Iterator[Dict]:
+        """Yield timestamped segments of an audio file as they are recognized"""
+        # Only starting the session is retried; segments already sent cannot be taken back
+        speech_recognizer, events = self._start_guarded(lambda: speechsdk.audio.AudioConfig(filename=audio_path),
+                                                        language, api_key, region)
+        return self._iter_guarded(speech_recognizer, events, region)
+
+    def _start_guarded(self, make_audio_config, language: str, api_key: str, region: str):
+        """Start continuous recognition behind the region's circuit breaker, retries and rate limit"""
+        # Sessions take a token from the rate limit but do not hold a concurrency slot
+        return protected_call('azure', api_key, lambda: self._start_continuous_recognition(
+            make_audio_config(), language, api_key, region
+        ), region, hold_slot=False)
+
+    def _start_continuous_recognition(self, audio_config, language: str, api_key: str, region: str):
+        """Start continuous recognition, returning the recognizer and its event queue"""
+        speech_config = speech_pool.recognition_config(api_key, region, self.languages.get(language, 'en-US'))
+        
+        speech_recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
+        
+        # Recognizer callbacks run on SDK threads; hand events over through a queue
+        events = queue.Queue()
+        
+        def on_recognized(evt):
+            result = evt.result
+            if result.reason == speechsdk.ResultReason.RecognizedSpeech and result.text:
+                # Offsets and durations are reported in 100ns ticks
+                start = result.offset / 10_000_000
+                events.put(('segment', {
+                    'text': result.text,
+                    'start': round(start, 3),
+                    'end': round(start + result.duration / 10_000_000, 3)
+                }))
+        
+        def on_canceled(evt):
+            details = evt.cancellation_details
+            if details.reason == speechsdk.CancellationReason.Error:
+                events.put(('error', self._cancellation_error('Recognition', details)))
+        
+        speech_recognizer.recognized.connect(on_recognized)
+        speech_recognizer.canceled.connect(on_canceled)
+        speech_recognizer.session_stopped.connect(lambda evt: events.put(('stopped', None)))
+        
+        speech_recognizer.start_continuous_recognition_async().get()
+        return speech_recognizer, events
+
+    def _iter_recognized(self, speech_recognizer, events: queue.Queue) -> Iterator[Dict]:
+        """Yield recognized segments until the session stops"""
+        try:
+            while True:
+                try:
+                    kind, payload = events.get(timeout=self.RECOGNITION_IDLE_TIMEOUT)
+                except queue.Empty:
+                    raise RuntimeError('Recognition timed out')
+                
+                if kind == 'segment':
+                    yield payload
+                elif kind == 'error':
+                    raise payload
+                else:
+                    break
+        finally:
+            speech_recognizer.stop_continuous_recognition_async().get()
+
+    def _iter_guarded(self, speech_recognizer, events: queue.Queue, region: str) -> Iterator[Dict]:
+        """Yield recognized segments, counting a failed session against the region's circuit breaker"""
+        try:
+            yield from self._iter_recognized(speech_recognizer, events)
+        except Exception as e:
+            get_guard('azure', region).record(e)
+            raise
+
+    def fetch_voices(self, api_key: str, region: str) -> List[Dict]:
+        """Fetch the full list of voices available to a key in a region"""
+        def fetch():
+            speech_config = speechsdk.SpeechConfig(subscription=api_key, region=region)
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+            result = synthesizer.get_voices_async().get()
+            if result.reason != speechsdk.ResultReason.VoicesListRetrieved:
+                raise ProviderError(f'Voice list failed: {result.error_details}')
+            return result.voices
+        
+        voices = [
+            {
+                'name': voice.short_name,
+                'display_name': voice.local_name,
+                'language': voice.locale,
+                'gender': voice.gender.name,
+                'styles': [style for style in voice.style_list if style]
+            }
+            for voice in protected_call('azure', api_key, timed(fetch, 'azure', 'voices', region), region)
+        ]
+        # The Azure catalog is the same for every key, so its voices are safe to use as labels
+        register_voices(voice['name'] for voice in voices)
+        return voices
+
+    def filter_voices(self, voices: List[Dict], language: str) -> List[Dict]:
+        """Keep the voices for a language, in any of its regional variants"""
+        prefix = self.languages.get(language, 'en-US').split('-')[0].lower()
+        return [voice for voice in voices if voice['language'].split('-')[0].lower() == prefix]
+
     def get_available_voices(self, language: str) -> List[Dict]:
         """Get available voices for a specific language"""
         voices = []
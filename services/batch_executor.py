@@ -0,0 +1,148 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from services.rate_limiter import wait_deadline
+
+
+class _Item:
+    """A batch item running on its own thread"""
+
+    def __init__(self, key: str, changed: threading.Condition):
+        self.key = key
+        self.changed = changed
+        self.future = Future()
+        self.started_at = None
+
+
+class BatchExecutor:
+    """Bounded-concurrency runner for batch items.
+
+    Items are pulled lazily from the input iterable and a new one starts
+    whenever fewer than ``max_workers`` are running, so a slow item does
+    not hold back the ones after it. Results are yielded in input order:
+    finished items wait behind a slower one, up to ``max_buffered`` items
+    in all, before dispatch pauses for it.
+
+    ``item_timeout`` counts from when an item starts running, and also
+    caps how long its provider calls may queue for a rate limit. Provider
+    calls cannot be interrupted, so an item that times out is abandoned on
+    its thread and a new thread takes its place; the rate limiter's
+    concurrency cap still bounds the calls actually in flight.
+    """
+
+    def __init__(self, max_workers: int, item_timeout: Optional[float] = None,
+                 max_buffered: Optional[int] = None):
+        self.max_workers = max(1, int(max_workers))
+        self.item_timeout = item_timeout
+        self.max_buffered = max(self.max_workers, max_buffered or 4 * self.max_workers)
+
+    def run(self, items: Iterable[Tuple[str, Any]],
+            handler: Callable[[str, Any], Dict]) -> Iterator[Tuple[str, Dict]]:
+        """Run handler(key, value) for every item, yielding (key, result) in order"""
+        items = iter(items)
+        changed = threading.Condition()
+        pending = deque()
+        exhausted = False
+        input_error = None
+
+        while True:
+            while not exhausted and self._has_room(pending):
+                try:
+                    key, value = next(items)
+                except StopIteration:
+                    exhausted = True
+                except Exception as e:
+                    # Finish items already dispatched before reporting an input error
+                    exhausted, input_error = True, e
+                else:
+                    pending.append(self._start(handler, key, value, changed))
+            if not pending:
+                break
+
+            head = pending[0]
+            with changed:
+                # Items report completion under the condition, so no wakeup is missed
+                if not (head.future.done() or self._is_overdue(head)
+                        or (not exhausted and self._has_room(pending))):
+                    changed.wait(self._time_left(head))
+            if head.future.done() or self._is_overdue(head):
+                yield self._collect(pending.popleft())
+
+        if input_error is not None:
+            raise input_error
+
+    def _has_room(self, pending: deque) -> bool:
+        """Whether another item may start: a worker is free and the buffer is not full"""
+        if len(pending) >= self.max_buffered:
+            return False
+        running = sum(1 for item in pending if not item.future.done() and not self._is_overdue(item))
+        return running < self.max_workers
+
+    def _is_overdue(self, item: _Item) -> bool:
+        return bool(self.item_timeout) and item.started_at is not None \
+            and time.monotonic() - item.started_at >= self.item_timeout
+
+    def _time_left(self, item: _Item) -> Optional[float]:
+        """Get how long to wait for an item before it times out, or None to wait until it is done"""
+        if not self.item_timeout:
+            return None
+        if item.started_at is None:
+            # Not running yet; check again once its thread has had a chance to start
+            return self.item_timeout
+        return max(0.0, item.started_at + self.item_timeout - time.monotonic())
+
+    def _start(self, handler: Callable[[str, Any], Dict], key: str, value: Any,
+               changed: threading.Condition) -> _Item:
+        item = _Item(key, changed)
+        # Items run in the caller's context, so nested limits (such as a
+        # rate limit deadline) carry over to their threads
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(self._call, handler, item, value),
+                                  name='orato-batch', daemon=True)
+        thread.start()
+        return item
+
+    def _collect(self, item: _Item) -> Tuple[str, Dict]:
+        """Wait for a single in-flight item, honouring the per-item timeout"""
+        timeout = None
+        if self.item_timeout:
+            started_at = item.started_at or time.monotonic()
+            timeout = max(0.0, started_at + self.item_timeout - time.monotonic())
+        try:
+            return item.key, item.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return item.key, {'success': False, 'error': f'Timed out after {self.item_timeout:g} seconds'}
+
+    def _call(self, handler: Callable[[str, Any], Dict], item: _Item, value: Any):
+        item.started_at = time.monotonic()
+        try:
+            if self.item_timeout:
+                with wait_deadline(self.item_timeout):
+                    result = handler(item.key, value)
+            else:
+                result = handler(item.key, value)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        with item.changed:
+            item.future.set_result(result)
+            item.changed.notify()
+
+
+def synthesize_chunks(chunks: List[str], synthesize: Callable[[str], bytes], max_workers: int) -> List[bytes]:
+    """Synthesize text chunks on up to max_workers threads, returning their audio in order.
+
+    A single chunk is synthesized on the calling thread. The first failed
+    chunk raises, naming its position.
+    """
+    if len(chunks) <= 1:
+        return [synthesize(chunk) for chunk in chunks]
+    handler = lambda index, chunk: {'success': True, 'audio': synthesize(chunk)}
+    parts = []
+    for index, result in BatchExecutor(max_workers).run(enumerate(chunks), handler):
+        if not result['success']:
+            raise RuntimeError(f'Chunk {index + 1} of {len(chunks)}: {result["error"]}')
+        parts.append(result['audio'])
+    return parts
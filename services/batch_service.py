@@ -1,97 +1,276 @@
 import json
 import os
-from typing import Dict, List
-from services.azure_service import AzureService
-from services.elevenlabs_service import ElevenLabsService
+import time
+import zipfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from services.file_service import FileService
+from services.batch_executor import BatchExecutor
+from services.metrics import BATCH_ITEM_DURATION
+from services.providers import get_azure_service, get_elevenlabs_service
+from utils.audio_formats import get_audio_format
+from utils.batch_parser import iter_batch_items
+from utils.config import Config
 
 class BatchService:
-    def __init__(self):
-        self.azure_service = AzureService()
-        self.elevenlabs_service = ElevenLabsService()
-        self.file_service = FileService()
+    def __init__(self, file_service: Optional[FileService] = None):
+        self.file_service = file_service or FileService()
+
+    @property
+    def azure_service(self):
+        # Shared with the app, so a worker holds one client pool per provider
+        return get_azure_service()
+
+    @property
+    def elevenlabs_service(self):
+        return get_elevenlabs_service()
 
     def process_batch(self, file, provider: str, language: str, api_key: str, 
-                     region: str, process_type: str) -> Dict:
-        """Process batch file for TTS or STT"""
+                     region: str, process_type: str, input_format: str = 'json',
+                     on_total: Optional[Callable[[int], None]] = None,
+                     on_item: Optional[Callable[[str, Dict], None]] = None,
+                     pack: bool = False, output_format: Optional[str] = None) -> Dict:
+        """Process batch file for TTS or STT
+
+        Items are dispatched while the file is still being parsed.
+        on_total(total) is called once the whole file has been parsed and
+        on_item(key, result) as each item completes, in input order.
+        With pack=True, runs of short Azure items are synthesized together
+        in a single request; packing only applies to WAV output formats.
+        """
+        if process_type != 'tts':
+            return {'success': False, 'error': 'STT batches take audio files or a ZIP archive, not a batch file'}
+        
         try:
-            # Read and parse JSON file
-            content = file.read().decode('utf-8')
-            data = json.loads(content)
-            
-            if not isinstance(data, dict):
-                return {'success': False, 'error': 'Invalid JSON format. Expected object with key-value pairs.'}
+            items = self._count_items(iter_batch_items(file, input_format), on_total)
             
-            results = []
-            errors = []
+            # Packed audio is split by byte offset, which only works for PCM
+            if pack and provider == 'azure' and get_audio_format(output_format, provider)['container'] == 'wav':
+                handler = lambda keys, texts: self._process_tts_batch_pack(keys, texts, language, api_key, region,
+                                                                           output_format)
+                return self._run_items(self._pack_items(items), handler, provider, on_item)
             
-            for key, value in data.items():
-                try:
-                    if process_type == 'tts':
-                        result = self._process_tts_batch_item(key, value, provider, language, api_key, region)
-                    else:
-                        result = self._process_stt_batch_item(key, value, provider, language, api_key, region)
-                    
-                    if result['success']:
-                        results.append(result)
-                    else:
-                        errors.append({'key': key, 'error': result['error']})
-                        
-                except Exception as e:
-                    errors.append({'key': key, 'error': str(e)})
-            
-            return {
-                'success': True,
-                'results': results,
-                'errors': errors,
-                'total_processed': len(results),
-                'total_errors': len(errors)
-            }
+            handler = lambda key, value: self._process_tts_batch_item(key, value, provider, language, api_key, region,
+                                                                      output_format)
+            return self._run_items(items, handler, provider, on_item)
             
         except json.JSONDecodeError as e:
             return {'success': False, 'error': f'Invalid JSON format: {str(e)}'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def process_stt_files(self, files: List[Tuple[str, str]], provider: str, language: str,
+                          api_key: str, region: str,
+                          on_total: Optional[Callable[[int], None]] = None,
+                          on_item: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Transcribe uploaded audio files, given as (original_name, filepath) pairs.
+
+        Each file is removed as soon as it has been transcribed.
+        """
+        try:
+            if on_total:
+                on_total(len(files))
+            handler = lambda key, filepath: self._process_stt_upload_item(key, filepath, provider, language, api_key, region)
+            return self._run_items(iter(files), handler, provider, on_item)
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def process_stt_archive(self, archive_path: str, provider: str, language: str,
+                            api_key: str, region: str,
+                            on_total: Optional[Callable[[int], None]] = None,
+                            on_item: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Transcribe every audio file inside a ZIP archive.
+
+        Members are extracted one at a time on the worker that transcribes
+        them, so only the files in flight are ever on disk.
+        """
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                members = [info for info in archive.infolist() if self._is_audio_member(info)]
+                if on_total:
+                    on_total(len(members))
+                
+                items = ((info.filename, info) for info in members)
+                handler = lambda key, info: self._process_stt_archive_item(archive, info, provider, language, api_key, region)
+                return self._run_items(items, handler, provider, on_item)
+            
+        except zipfile.BadZipFile:
+            return {'success': False, 'error': 'Invalid ZIP archive'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _run_items(self, items: Iterator[Tuple[str, Any]], handler: Callable[[str, Any], Dict],
+                   provider: str, on_item: Optional[Callable[[str, Dict], None]]) -> Dict:
+        """Run handler over items concurrently and collect results and errors"""
+        results = []
+        errors = []
+        
+        executor = BatchExecutor(Config.get_batch_workers(provider), Config.BATCH_ITEM_TIMEOUT)
+        
+        def timed_handler(key, value):
+            started = time.perf_counter()
+            result = handler(key, value)
+            outcome = 'success' if result.get('success', 'items' in result) else 'error'
+            BATCH_ITEM_DURATION.labels(provider, outcome).observe(time.perf_counter() - started)
+            return result
+        
+        for key, result in self._unpack_results(executor.run(items, timed_handler)):
+            if on_item:
+                on_item(key, result)
+            if result['success']:
+                results.append(result)
+            else:
+                errors.append({'key': key, 'error': result['error']})
+        
+        return {
+            'success': True,
+            'results': results,
+            'errors': errors,
+            'total_processed': len(results),
+            'total_errors': len(errors)
+        }
+
+    @staticmethod
+    def _pack_items(items: Iterator[Tuple[str, Any]]) -> Iterator[Tuple[Tuple[str, ...], List[Any]]]:
+        """Group consecutive short items into packs of (keys, texts).
+
+        Long or non-text items are passed on as packs of one, so input order
+        is preserved.
+        """
+        keys, texts, chars = [], [], 0
+        for key, text in items:
+            packable = isinstance(text, str) and 0 < len(text) <= Config.TTS_PACK_ITEM_MAX_CHARS
+            if keys and (not packable or len(keys) >= Config.TTS_PACK_MAX_ITEMS
+                         or chars + len(text) > Config.TTS_PACK_MAX_CHARS):
+                yield tuple(keys), texts
+                keys, texts, chars = [], [], 0
+            if not packable:
+                yield (key,), [text]
+                continue
+            keys.append(key)
+            texts.append(text)
+            chars += len(text)
+        if keys:
+            yield tuple(keys), texts
+
+    @staticmethod
+    def _unpack_results(results: Iterator[Tuple[Any, Dict]]) -> Iterator[Tuple[str, Dict]]:
+        """Expand pack results into one (key, result) pair per item"""
+        for key, result in results:
+            if not isinstance(key, tuple):
+                yield key, result
+            elif 'items' in result:
+                yield from zip(key, result['items'])
+            else:
+                # The whole pack failed or timed out
+                for item_key in key:
+                    yield item_key, result
+
+    @staticmethod
+    def _count_items(items: Iterator[Tuple[str, Any]],
+                     on_total: Optional[Callable[[int], None]]) -> Iterator[Tuple[str, Any]]:
+        """Pass items through, reporting the count once they are exhausted"""
+        total = 0
+        for item in items:
+            total += 1
+            yield item
+        if on_total:
+            on_total(total)
+
     def _process_tts_batch_item(self, key: str, text: str, provider: str, 
-                               language: str, api_key: str, region: str) -> Dict:
+                               language: str, api_key: str, region: str,
+                               output_format: Optional[str] = None) -> Dict:
         """Process a single TTS batch item"""
         try:
             if provider == 'azure':
-                result = self.azure_service.text_to_speech(text, language, None, api_key, region)
+                result = self.azure_service.text_to_speech(text, language, None, api_key, region, output_format)
             elif provider == 'elevenlabs':
-                result = self.elevenlabs_service.text_to_speech(text, None, api_key)
+                result = self.elevenlabs_service.text_to_speech(text, None, api_key, output_format)
             else:
                 return {'success': False, 'error': 'Invalid provider'}
             
-            if result['success']:
-                return {
-                    'success': True,
-                    'original_key': key,
-                    'text': text,
-                    'filename': result['filename'],
-                    'download_url': f'/download/{result["filename"]}'
-                }
-            else:
-                return {'success': False, 'error': result['error']}
+            return self._tts_batch_result(key, text, result)
                 
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _tts_batch_result(key: str, text: str, result: Dict) -> Dict:
+        """Build the batch result for a synthesized item"""
+        if result['success']:
+            item = {
+                'success': True,
+                'original_key': key,
+                'text': text,
+                'filename': result['filename'],
+                'download_url': f'/download/{result["filename"]}'
+            }
+            if 'routing' in result:
+                item['routing'] = result['routing']
+            return item
+        else:
+            return {'success': False, 'error': result['error']}
+
+    def _process_tts_batch_pack(self, keys: Tuple[str, ...], texts: List[Any],
+                                language: str, api_key: str, region: str,
+                                output_format: Optional[str] = None) -> Dict:
+        """Process a pack of Azure TTS batch items with a single synthesis"""
+        if len(keys) == 1:
+            return {'items': [self._process_tts_batch_item(keys[0], texts[0], 'azure', language, api_key, region,
+                                                           output_format)]}
+        
+        results = self.azure_service.text_to_speech_packed(texts, language, None, api_key, region, output_format)
+        return {'items': [self._tts_batch_result(key, text, result) for key, text, result in zip(keys, texts, results)]}
+
     def _process_stt_batch_item(self, key: str, audio_path: str, provider: str, 
                                language: str, api_key: str, region: str) -> Dict:
         """Process a single STT batch item"""
         try:
-            # For STT batch processing, we would need the actual audio files
-            # This is a placeholder implementation
-            return {
-                'success': False,
-                'error': 'STT batch processing requires audio files. Please use individual STT processing.'
-            }
+            if provider != 'azure':
+                return {'success': False, 'error': 'Only Azure supports STT'}
+            
+            result = self.azure_service.speech_to_text_continuous(audio_path, language, api_key, region)
             
+            if result['success']:
+                item = {
+                    'success': True,
+                    'original_key': key,
+                    'text': result['text']
+                }
+                if 'routing' in result:
+                    item['routing'] = result['routing']
+                return item
+            else:
+                return {'success': False, 'error': result['error']}
+                
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def _process_stt_upload_item(self, key: str, filepath: str, provider: str,
+                                 language: str, api_key: str, region: str) -> Dict:
+        """Transcribe an uploaded file and remove it afterwards"""
+        try:
+            return self._process_stt_batch_item(key, filepath, provider, language, api_key, region)
+        finally:
+            self.file_service.cleanup_file(filepath)
+
+    def _process_stt_archive_item(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, provider: str,
+                                  language: str, api_key: str, region: str) -> Dict:
+        """Extract a single archive member, transcribe it and remove it afterwards"""
+        if info.file_size > Config.MAX_FILE_SIZE:
+            return {'success': False, 'error': f'File exceeds maximum size of {Config.MAX_FILE_SIZE} bytes'}
+        
+        filepath = self.file_service.extract_archive_member(archive, info, 'stt')
+        return self._process_stt_upload_item(info.filename, filepath, provider, language, api_key, region)
+
+    def _is_audio_member(self, info: zipfile.ZipInfo) -> bool:
+        """Skip directories, hidden files and macOS resource forks"""
+        name = info.filename.replace('\\', '/')
+        basename = name.rsplit('/', 1)[-1]
+        if info.is_dir() or not basename or basename.startswith('.') or name.startswith('__MACOSX/'):
+            return False
+        return self.file_service.is_allowed_file(basename)
+
     def create_batch_template(self, process_type: str) -> Dict:
         """Create a template for batch processing"""
         if process_type == 'tts':
@@ -101,10 +280,11 @@ class BatchService:
                 "3.wav": "You can add as many entries as you want."
             }
         else:
-            template = {
-                "audio1.wav": "path/to/audio1.wav",
-                "audio2.wav": "path/to/audio2.wav",
-                "audio3.wav": "path/to/audio3.wav"
+            return {
+                'success': True,
+                'template': None,
+                'instructions': 'For STT: Upload the audio files themselves, or a ZIP archive of them. '
+                                'Each file name becomes the key of its transcript.'
             }
         
         return {
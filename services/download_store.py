@@ -0,0 +1,222 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from services.storage import StorageBackend, storage_backend
+from utils.config import Config
+from utils.sqlite import SQLiteDatabase
+
+
+class DownloadStore:
+    """Output files kept in hash-sharded subdirectories, indexed in sqlite.
+
+    A file named ``name`` lives at ``<directory>/ab/cd/name``, where ``abcd``
+    starts the SHA-256 of the name, so no directory grows past a few hundred
+    entries and lookups never list a directory. The index records each
+    file's size and expiry; ``reap`` deletes expired files by querying it
+    instead of scanning the tree. The index is a sqlite database in WAL mode,
+    shared by every worker process on the host.
+
+    Files are written under ``partial_path`` and moved into place once
+    complete. Partial files are not indexed; ``sweep_partials`` removes the
+    ones a killed worker left behind.
+
+    Registered files are also published to ``backend`` so that other
+    replicas can serve them. Publishing runs on up to ``publish_workers``
+    background threads, so a request is not held up by the upload.
+    """
+
+    def __init__(self, directory: str = 'downloads', index_path: Optional[str] = None,
+                 shard_depth: int = 2, ttl_seconds: float = 24 * 3600,
+                 backend: Optional[StorageBackend] = None, publish_workers: int = 4):
+        self.directory = directory
+        self.backend = backend or StorageBackend()
+        self.publish_workers = max(1, publish_workers)
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+        self.index_path = index_path or os.path.join(directory, '.index.sqlite3')
+        self.shard_depth = max(0, min(shard_depth, 4))
+        self.ttl_seconds = ttl_seconds
+        self.partial_dir = os.path.join(directory, '.partial')
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        self._db = SQLiteDatabase(self.index_path, pragmas=['synchronous=NORMAL'])
+        connection = self._db.connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'filename TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS files_expires_at ON files (expires_at)')
+
+    def path(self, filename: str) -> str:
+        """Get the sharded path for a file name, whether or not the file exists"""
+        digest = hashlib.sha256(filename.encode('utf-8')).hexdigest()
+        shards = [digest[level * 2:level * 2 + 2] for level in range(self.shard_depth)]
+        return os.path.join(self.directory, *shards, filename)
+
+    def prepare(self, filename: str) -> str:
+        """Get the sharded path for a new file, creating its directory"""
+        filepath = self.path(filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        return filepath
+
+    def partial_path(self, filename: str) -> str:
+        """Get a unique path to write a file to before moving it to its sharded path"""
+        os.makedirs(self.partial_dir, exist_ok=True)
+        return os.path.join(self.partial_dir, f'{filename}.{uuid.uuid4().hex}.part')
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """Get the path of an existing file, or None"""
+        if not self._is_valid_name(filename):
+            return None
+        filepath = self.path(filename)
+        if os.path.isfile(filepath):
+            return filepath
+        # Files written before sharding stay at the top level until adopted
+        legacy_path = os.path.join(self.directory, filename)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+        return None
+
+    def relative_path(self, filepath: str) -> str:
+        """Get a file's path below the store directory, with forward slashes"""
+        return os.path.relpath(filepath, self.directory).replace(os.sep, '/')
+
+    def register(self, filename: str, ttl_seconds: Optional[float] = None, publish: bool = True):
+        """Record a file that was just written, expiring it after ttl_seconds"""
+        filepath = self.path(filename)
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._db.transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO files (filename, size, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                (filename, size, now, expires_at)
+            )
+        if publish and self.backend.publishes:
+            self._get_publisher().submit(self._publish, filename, filepath)
+
+    def _get_publisher(self) -> ThreadPoolExecutor:
+        # Created on first use, so a forked worker never inherits the parent's threads
+        with self._publisher_lock:
+            if self._publisher is None:
+                self._publisher = ThreadPoolExecutor(max_workers=self.publish_workers,
+                                                     thread_name_prefix='orato-publish')
+            return self._publisher
+
+    def _publish(self, filename: str, filepath: str):
+        try:
+            self.backend.publish(filename, filepath)
+        except Exception as e:
+            # The file can still be served by this replica
+            print(f"Error publishing download {filename}: {e}")
+
+    def touch(self, filename: str, ttl_seconds: Optional[float] = None):
+        """Push back the expiry of a file that is being reused"""
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._db.transaction() as connection:
+            updated = connection.execute(
+                'UPDATE files SET expires_at = MAX(expires_at, ?) WHERE filename = ?', (expires_at, filename)
+            ).rowcount
+        if not updated:
+            self.register(filename, ttl_seconds, publish=False)
+
+    def remove(self, filename: str):
+        """Delete a file and its index entry"""
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM files WHERE filename = ?', (filename,))
+        self._delete(self.path(filename))
+
+    def reap(self, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """Delete every expired file, returning how many were removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        while True:
+            # Claim a batch in one transaction so concurrent reapers never share rows
+            with self._db.transaction() as connection:
+                names = [row[0] for row in connection.execute(
+                    'SELECT filename FROM files WHERE expires_at <= ? ORDER BY expires_at LIMIT ?',
+                    (now, batch_size)
+                )]
+                connection.executemany('DELETE FROM files WHERE filename = ?', [(name,) for name in names])
+            for name in names:
+                self._delete(self.path(name))
+            removed += len(names)
+            if len(names) < batch_size:
+                return removed
+
+    def sweep_partials(self, max_age_seconds: float) -> int:
+        """Delete partial files not written to for max_age_seconds, returning how many were removed"""
+        # Only files being written live here, so listing the directory stays cheap
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.partial_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass  # Finished or removed meanwhile
+        return removed
+
+    def adopt_unsharded(self) -> int:
+        """Move files left at the top level by the flat layout into shards and index them.
+
+        They keep their remaining lifetime, counted from their mtime.
+        """
+        adopted = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            if not entry.is_file() or not self._is_valid_name(entry.name) or entry.name.endswith('.part'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                os.replace(entry.path, self.prepare(entry.name))
+            except OSError:
+                continue  # Another worker got there first
+            adopted.append(entry.name)
+            self.register(entry.name, mtime + self.ttl_seconds - time.time(), publish=False)
+        return len(adopted)
+
+    def stats(self) -> dict:
+        """Get the number and total size of indexed files"""
+        count, size = self._db.connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        return {'files': count, 'bytes': size}
+
+    @staticmethod
+    def _is_valid_name(filename: str) -> bool:
+        # Hidden names cover the index database and its WAL files
+        return bool(filename) and os.path.basename(filename) == filename and not filename.startswith('.')
+
+    @staticmethod
+    def _delete(filepath: str):
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing download {filepath}: {e}")
+
+
+download_store = DownloadStore(
+    directory='downloads',
+    index_path=Config.DOWNLOAD_INDEX_PATH,
+    shard_depth=Config.DOWNLOAD_SHARD_DEPTH,
+    ttl_seconds=Config.DOWNLOAD_TTL_HOURS * 3600,
+    backend=storage_backend,
+    publish_workers=Config.DOWNLOAD_PUBLISH_WORKERS
+)
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics import record_audio_bytes, timed
+from services.resilience import protected_call
+from utils.config import Config
+
+
+class ElevenLabsAPIError(Exception):
+    """Error response from the ElevenLabs API"""
+
+    TRANSIENT_STATUS_CODES = {408, 500, 502, 503, 504}
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def transient(self) -> bool:
+        """Server errors and failed connections (no status) are worth retrying"""
+        return self.status_code is None or self.status_code in self.TRANSIENT_STATUS_CODES
+
+
+class ElevenLabsClient:
+    """ElevenLabs REST client that carries credentials per call.
+
+    Each API key gets its own pooled ``requests.Session`` so connections are
+    reused across requests, and no process-wide state (such as the
+    ``ELEVEN_API_KEY`` environment variable) is touched, which makes it safe
+    to call concurrently for different tenants.
+    """
+
+    def __init__(self, base_url: str = Config.ELEVENLABS_BASE_URL,
+                 pool_size: int = Config.ELEVENLABS_POOL_SIZE,
+                 timeout: float = Config.ELEVENLABS_TIMEOUT,
+                 max_sessions: int = 64):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def text_to_speech(self, api_key: str, voice_id: str, text: str,
+                       model_id: str, voice_settings: Dict, output_format: str = 'mp3_44100_128') -> bytes:
+        """Generate audio for text in the given output format (MP3, or raw PCM for pcm_*)"""
+        response = self._request(
+            api_key, 'post', f'/text-to-speech/{voice_id}', operation='tts', voice=voice_id,
+            params={'output_format': output_format},
+            headers={'Accept': 'audio/mpeg' if output_format.startswith('mp3') else '*/*'},
+            json={'text': text, 'model_id': model_id, 'voice_settings': voice_settings}
+        )
+        record_audio_bytes('elevenlabs', 'tts', len(response.content))
+        return response.content
+
+    def stream_text_to_speech(self, api_key: str, voice_id: str, text: str,
+                              model_id: str, voice_settings: Dict,
+                              chunk_size: int = 2048, latency: int = 1) -> Iterator[bytes]:
+        """Generate audio for text and yield MP3 chunks as they arrive"""
+        response = self._request(
+            api_key, 'post', f'/text-to-speech/{voice_id}/stream', operation='tts_stream', voice=voice_id,
+            params={'optimize_streaming_latency': latency},
+            headers={'Accept': 'audio/mpeg'},
+            json={'text': text, 'model_id': model_id, 'voice_settings': voice_settings},
+            stream=True
+        )
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+    def get_voice(self, api_key: str, voice_id: str) -> Dict:
+        """Get details for a single voice"""
+        return self._request(api_key, 'get', f'/voices/{voice_id}', operation='voice').json()
+
+    def get_voices(self, api_key: str) -> List[Dict]:
+        """Get all voices available to the account"""
+        return self._request(api_key, 'get', '/voices', operation='voices').json().get('voices', [])
+
+    def _request(self, api_key: str, method: str, path: str, operation: str = 'api',
+                 voice: str = '', **kwargs) -> requests.Response:
+        # Throttled and transient failures are retried; a streamed body is
+        # read after its rate limit slot has been released
+        send = lambda: self._send(api_key, method, path, **kwargs)
+        return protected_call('elevenlabs', api_key, timed(send, 'elevenlabs', operation, voice=voice))
+
+    def _send(self, api_key: str, method: str, path: str, **kwargs) -> requests.Response:
+        session = self._session(api_key)
+        try:
+            response = session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise ElevenLabsAPIError(f'ElevenLabs API unreachable: {e}')
+        if response.status_code == 200:
+            return response
+
+        try:
+            detail = response.json().get('detail', response.text)
+            message = detail.get('message', str(detail)) if isinstance(detail, dict) else str(detail)
+        except ValueError:
+            message = response.text
+        retry_after = response.headers.get('Retry-After')
+        response.close()
+        raise ElevenLabsAPIError(
+            f'ElevenLabs API error: {response.status_code} - {message}',
+            status_code=response.status_code,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+
+    def _session(self, api_key: str) -> requests.Session:
+        """Get the pooled session for an API key, creating it on first use"""
+        with self._lock:
+            session = self._sessions.get(api_key)
+            if session is not None:
+                self._sessions.move_to_end(api_key)
+                return session
+
+            session = requests.Session()
+            session.headers.update({'xi-api-key': api_key})
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sessions[api_key] = session
+
+            # Evict the least recently used sessions
+            while len(self._sessions) > self.max_sessions:
+                _, old_session = self._sessions.popitem(last=False)
+                old_session.close()
+
+            return session
+
+
+elevenlabs_client = ElevenLabsClient()
@@ -1,47 +1,74 @@
-import os
-import uuid
-from elevenlabs import Voice, VoiceSettings, generate, save, voices
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+from services.batch_executor import synthesize_chunks
+from services.elevenlabs_client import elevenlabs_client
+from services.metrics import register_voices
+from services.tts_cache import tts_cache
+from utils.audio_formats import concat_audio, get_audio_format, pcm_to_wav
+from utils.config import Config
+from utils.text_chunker import split_text
 
 class ElevenLabsService:
     def __init__(self):
         self.default_voice_id = "21m00Tcm4TlvDq8ikWAM"  # Default voice ID
+        self.model_id = "eleven_monolingual_v1"
+        self.voice_settings = {
+            'stability': 0.5,
+            'similarity_boost': 0.5,
+            'style': 0.0,
+            'use_speaker_boost': True
+        }
+        # Account voices (e.g. clones) vary per key, so only the premade ones are metric labels
+        register_voices(voice['name'] for voice in self.get_available_voices())
 
-    def text_to_speech(self, text: str, voice_name: Optional[str], api_key: str) -> Dict:
+    def text_to_speech(self, text: str, voice_name: Optional[str], api_key: str,
+                       output_format: Optional[str] = None) -> Dict:
         """Convert text to speech using ElevenLabs API"""
         try:
-            # Set API key
-            os.environ['ELEVEN_API_KEY'] = api_key
-            
             # Use provided voice or default
             voice_id = voice_name if voice_name else self.default_voice_id
+            audio_format = get_audio_format(output_format, 'elevenlabs')
             
-            # Generate unique filename
-            filename = f"elevenlabs_tts_{uuid.uuid4().hex}.mp3"
-            filepath = os.path.join('downloads', filename)
-            
-            # Generate audio
-            audio = generate(
-                text=text,
-                voice=Voice(
-                    voice_id=voice_id,
-                    settings=VoiceSettings(
-                        stability=0.5,
-                        similarity_boost=0.5,
-                        style=0.0,
-                        use_speaker_boost=True
-                    )
-                )
+            return tts_cache.get_or_create(
+                'elevenlabs', voice_id, None, text, audio_format['extension'],
+                lambda filepath: self._synthesize_to_file(text, voice_id, api_key, filepath, audio_format),
+                output_format=audio_format['name'],
+                # Voices may be private to an account, so outputs are never shared across keys
+                scope=api_key
             )
             
-            # Save audio
-            save(audio, filepath)
-            
-            return {'success': True, 'filename': filename}
-            
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def _synthesize_to_file(self, text: str, voice_id: str, api_key: str, filepath: str,
+                            audio_format: Dict) -> Dict:
+        """Synthesize text into the given file, splitting long texts into chunks"""
+        chunks = split_text(text, Config.TTS_CHUNK_CHARS)
+        synthesize = lambda chunk: elevenlabs_client.text_to_speech(api_key, voice_id, chunk, self.model_id,
+                                                                   self.voice_settings, audio_format['elevenlabs'])
+        
+        # Synthesize chunks concurrently and join them in order
+        parts = synthesize_chunks(chunks if len(chunks) > 1 else [text], synthesize, Config.TTS_CHUNK_WORKERS)
+        
+        if audio_format['container'] == 'wav':
+            # PCM formats come back raw, so the chunks join directly
+            audio = pcm_to_wav(audio_format, b''.join(parts))
+        elif len(parts) == 1:
+            audio = parts[0]
+        else:
+            audio = concat_audio(audio_format, parts)
+        
+        # Save audio
+        with open(filepath, 'wb') as f:
+            f.write(audio)
+        
+        return {'success': True}
+
+    def stream_text_to_speech(self, text: str, voice_name: Optional[str], api_key: str) -> Iterator[bytes]:
+        """Generate MP3 audio with ElevenLabs streaming and yield chunks as they arrive"""
+        voice_id = voice_name if voice_name else self.default_voice_id
+        
+        return elevenlabs_client.stream_text_to_speech(api_key, voice_id, text, self.model_id, self.voice_settings)
+
     def get_available_voices(self) -> List[Dict]:
         """Get available voices from ElevenLabs"""
         try:
@@ -99,19 +126,25 @@ class ElevenLabsService:
         except Exception as e:
             return []
 
+    def fetch_voices(self, api_key: str) -> List[Dict]:
+        """Fetch every voice available to the account"""
+        return [self._voice_info(voice) for voice in elevenlabs_client.get_voices(api_key)]
+
     def get_voice_by_id(self, voice_id: str, api_key: str) -> Optional[Dict]:
         """Get voice details by ID"""
         try:
-            os.environ['ELEVEN_API_KEY'] = api_key
-            voice = voices.get(voice_id)
-            
-            return {
-                'name': voice.voice_id,
-                'display_name': voice.name,
-                'language': voice.labels.get('language', 'en'),
-                'description': voice.labels.get('description', '')
-            }
+            return self._voice_info(elevenlabs_client.get_voice(api_key, voice_id))
             
         except Exception as e:
             return None
 
+    @staticmethod
+    def _voice_info(voice: Dict) -> Dict:
+        labels = voice.get('labels') or {}
+        return {
+            'name': voice['voice_id'],
+            'display_name': voice.get('name', voice['voice_id']),
+            'language': labels.get('language', 'en'),
+            'description': labels.get('description', '')
+        }
+
@@ -1,18 +1,41 @@
+import hashlib
 import os
+import shutil
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from werkzeug.utils import secure_filename
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+from services.download_store import download_store
+from services.storage import storage_backend
+from services.tts_cache import tts_cache
+
+# Content hashes of download files, keyed by (path, size, mtime) so a
+# rewritten file is hashed again
+_etag_cache = OrderedDict()
+_etag_cache_lock = threading.Lock()
+ETAG_CACHE_SIZE = 4096
+
+# Partial outputs not written to for this long were left by a worker that died mid-write
+PARTIAL_MAX_AGE_SECONDS = 3600
+
+_reaper = None
+_reaper_lock = threading.Lock()
 
 class FileService:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or storage_backend
         self.upload_dir = 'uploads'
         self.download_dir = 'downloads'
+        self.jobs_dir = 'jobs'
         self.allowed_extensions = {'wav', 'mp3', 'mp4', 'm4a', 'ogg', 'flac'}
 
     def create_directories(self):
         """Create necessary directories"""
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.download_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
         os.makedirs('static', exist_ok=True)
         os.makedirs('templates', exist_ok=True)
 
@@ -21,21 +44,77 @@ class FileService:
         filename = secure_filename(file.filename)
         unique_filename = f"{prefix}_{uuid.uuid4().hex}_{filename}"
         filepath = os.path.join(self.upload_dir, unique_filename)
-        file.save(filepath)
+        self.backend.save_upload(file, filepath)
+        return filepath
+
+    def extract_archive_member(self, archive, info, prefix: str = 'file',
+                               chunk_size: int = 1024 * 1024) -> str:
+        """Extract a single ZIP member into the upload directory and return its filepath"""
+        filename = secure_filename(info.filename.replace('\\', '/').rsplit('/', 1)[-1])
+        unique_filename = f"{prefix}_{uuid.uuid4().hex}_{filename}"
+        filepath = os.path.join(self.upload_dir, unique_filename)
+        try:
+            with archive.open(info) as source, open(filepath, 'wb') as target:
+                shutil.copyfileobj(source, target, chunk_size)
+        except Exception:
+            self.cleanup_file(filepath)
+            raise
         return filepath
 
     def get_download_path(self, filename: str) -> Optional[str]:
-        """Get full path for download file"""
-        filepath = os.path.join(self.download_dir, filename)
-        if os.path.exists(filepath):
-            return filepath
-        return None
+        """Get full path for download file, if this replica holds it"""
+        return download_store.lookup(filename)
+
+    def get_download_url(self, filename: str) -> Optional[str]:
+        """Get a URL for a download file held by the storage backend instead of this replica"""
+        return self.backend.download_url(filename)
+
+    def get_file_etag(self, filepath: str) -> str:
+        """Get a strong ETag for a file based on its content hash"""
+        stat = os.stat(filepath)
+        key = (filepath, stat.st_size, stat.st_mtime_ns)
+        with _etag_cache_lock:
+            etag = _etag_cache.get(key)
+            if etag:
+                _etag_cache.move_to_end(key)
+                return etag
+
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        etag = digest.hexdigest()
+
+        with _etag_cache_lock:
+            _etag_cache[key] = etag
+            while len(_etag_cache) > ETAG_CACHE_SIZE:
+                _etag_cache.popitem(last=False)
+        return etag
+
+    def tee_to_download(self, chunks: Iterable[bytes], filename: str) -> Iterator[bytes]:
+        """Yield chunks while writing them to the downloads directory.
+
+        The file only appears under its final name once the stream has been
+        fully consumed, so partial outputs are never served.
+        """
+        temp_path = download_store.partial_path(filename)
+        completed = False
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(temp_path, download_store.prepare(filename))
+            download_store.register(filename)
+            completed = True
+        finally:
+            if not completed:
+                self.cleanup_file(temp_path)
 
     def cleanup_file(self, filepath: str):
         """Clean up temporary file"""
         try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            self.backend.cleanup(filepath)
         except Exception as e:
             print(f"Error cleaning up file {filepath}: {e}")
 
@@ -52,19 +131,49 @@ class FileService:
             return 0
 
     def cleanup_old_files(self, max_age_hours: int = 24):
-        """Clean up files older than specified hours"""
-        import time
+        """Clean up expired downloads, and uploads and job files older than specified hours"""
+        # Downloads are found through the store's index, without listing them
+        try:
+            download_store.reap()
+            download_store.sweep_partials(PARTIAL_MAX_AGE_SECONDS)
+        except Exception as e:
+            print(f"Error reaping downloads: {e}")
+        
+        # Uploads are removed once processed and job files are few, so these stay small
         current_time = time.time()
         max_age_seconds = max_age_hours * 3600
         
-        for directory in [self.upload_dir, self.download_dir]:
+        for directory in [self.upload_dir, self.jobs_dir]:
             try:
-                for filename in os.listdir(directory):
-                    filepath = os.path.join(directory, filename)
-                    if os.path.isfile(filepath):
-                        file_age = current_time - os.path.getmtime(filepath)
-                        if file_age > max_age_seconds:
-                            os.remove(filepath)
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file() and current_time - entry.stat().st_mtime > max_age_seconds:
+                            os.remove(entry.path)
             except Exception as e:
                 print(f"Error cleaning up directory {directory}: {e}")
+        
+        # Keep the TTS cache index in sync with what was removed
+        tts_cache.prune()
+
+    def start_reaper(self, interval: float, max_age_hours: int = 24):
+        """Run cleanup_old_files every interval seconds on a daemon thread (once per process)"""
+        global _reaper
+        if interval <= 0:
+            return
+        with _reaper_lock:
+            if _reaper is not None:
+                return
+            
+            def reap():
+                # Files written by the flat layout are moved into the index first
+                try:
+                    download_store.adopt_unsharded()
+                except Exception as e:
+                    print(f"Error adopting unsharded downloads: {e}")
+                while True:
+                    self.cleanup_old_files(max_age_hours)
+                    time.sleep(interval)
+            
+            _reaper = threading.Thread(target=reap, name='orato-reaper', daemon=True)
+            _reaper.start()
 
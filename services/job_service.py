@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from services.file_service import FileService
+from utils.config import Config
+from utils.zip_stream import unique_arcname
+
+class JobService:
+    """Run batch jobs on a background worker pool and track their progress.
+
+    Job state is kept in memory by the process running the job and
+    periodically written to ``jobs/<job_id>.json``, so any gunicorn worker
+    can answer status polls for any job. The file records the owning process
+    and a heartbeat refreshed every ``heartbeat_interval`` seconds; an
+    unfinished job whose owner has exited or gone quiet for
+    ``stale_seconds`` (after a worker restart or kill) is reported as failed.
+    """
+
+    FLUSH_INTERVAL = 0.5  # seconds between progress writes
+    JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, batch_service, max_workers: int = Config.JOB_WORKERS,
+                 heartbeat_interval: float = Config.JOB_HEARTBEAT_INTERVAL,
+                 stale_seconds: float = Config.JOB_STALE_SECONDS):
+        self.batch_service = batch_service
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.file_service = FileService()
+        self.jobs_dir = self.file_service.jobs_dir
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='orato-job')
+        self._jobs = {}
+        self._last_flush = {}
+        self._write_locks = {}  # job_id -> lock held from serializing a job to replacing its file
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def submit(self, file, provider: str, language: str, api_key: str,
+               region: str, process_type: str, input_format: str = 'json',
+               pack: bool = False, output_format: Optional[str] = None) -> Dict:
+        """Store the uploaded batch file and enqueue it for processing"""
+        filepath = self.file_service.save_uploaded_file(file, 'batch')
+
+        def work(on_total, on_item):
+            with open(filepath, 'rb') as batch_file:
+                return self.batch_service.process_batch(
+                    batch_file, provider, language, api_key, region, process_type, input_format,
+                    on_total=on_total, on_item=on_item, pack=pack, output_format=output_format
+                )
+
+        return self._enqueue(process_type, provider, work, [filepath])
+
+    def submit_stt(self, files: List, provider: str, language: str,
+                   api_key: str, region: str) -> Dict:
+        """Store uploaded audio files, or a single ZIP of them, and enqueue them for transcription"""
+        if len(files) == 1 and files[0].filename.lower().endswith('.zip'):
+            archive_path = self.file_service.save_uploaded_file(files[0], 'batch')
+
+            def work(on_total, on_item):
+                return self.batch_service.process_stt_archive(
+                    archive_path, provider, language, api_key, region,
+                    on_total=on_total, on_item=on_item
+                )
+
+            return self._enqueue('stt', provider, work, [archive_path])
+
+        uploads = [(file.filename, self.file_service.save_uploaded_file(file, 'stt')) for file in files]
+
+        def work(on_total, on_item):
+            return self.batch_service.process_stt_files(
+                uploads, provider, language, api_key, region,
+                on_total=on_total, on_item=on_item
+            )
+
+        return self._enqueue('stt', provider, work, [filepath for _, filepath in uploads])
+
+    def _enqueue(self, process_type: str, provider: str,
+                 work: Callable[[Callable, Callable], Dict], cleanup_paths: List[str]) -> Dict:
+        """Create a queued job and run work(on_total, on_item) for it on the pool"""
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'type': process_type,
+            'provider': provider,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'total': None,
+            'results': [],
+            'errors': [],
+            'error': None,
+            'owner': {'host': socket.gethostname(), 'pid': os.getpid()},
+            'heartbeat_at': time.time()
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._write_locks[job_id] = threading.Lock()
+        self._flush(job_id, force=True)
+        self._start_heartbeat()
+
+        self.executor.submit(self._run, job_id, work, cleanup_paths)
+        return self._summary(job)
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Get job status and progress without the item results"""
+        job = self._load(job_id)
+        return self._summary(job) if job else None
+
+    def get_results(self, job_id: str, offset: int = 0) -> Optional[Dict]:
+        """Get the results completed so far, starting at offset"""
+        job = self._load(job_id)
+        if not job:
+            return None
+
+        response = self._summary(job)
+        response.update({
+            'success': job['status'] != 'failed',
+            'offset': offset,
+            'results': job['results'][offset:],
+            'errors': job['errors'],
+            'total_processed': len(job['results']),
+            'total_errors': len(job['errors'])
+        })
+        return response
+
+    def get_archive_entries(self, job_id: str) -> Optional[Dict]:
+        """Get the job summary plus the archive entries for its outputs, named by original key.
+
+        Audio outputs are listed as (arcname, filepath) in ``files`` and STT
+        transcripts as (arcname, bytes) in ``transcripts``.
+        """
+        job = self._load(job_id)
+        if not job:
+            return None
+
+        used = set()
+        files = []
+        transcripts = []
+        for result in job['results']:
+            if job['type'] == 'stt':
+                arcname = unique_arcname(os.path.splitext(str(result['original_key']))[0], '.txt', used)
+                transcripts.append((arcname, result['text'].encode('utf-8')))
+                continue
+            filepath = self.file_service.get_download_path(result.get('filename', ''))
+            if not filepath:
+                continue
+            extension = os.path.splitext(filepath)[1]
+            files.append((unique_arcname(str(result['original_key']), extension, used), filepath))
+
+        response = self._summary(job)
+        response['files'] = files
+        response['transcripts'] = transcripts
+        response['manifest'] = json.dumps({'results': job['results'], 'errors': job['errors']}, indent=2)
+        return response
+
+    def _run(self, job_id: str, work: Callable[[Callable, Callable], Dict], cleanup_paths: List[str]):
+        """Process a queued job on a pool thread"""
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = work(lambda total: self._update(job_id, total=total),
+                          lambda key, item: self._record_item(job_id, key, item))
+
+            if result['success']:
+                self._update(job_id, status='completed', finished_at=time.time())
+            else:
+                self._update(job_id, status='failed', finished_at=time.time(), error=result['error'])
+
+        except Exception as e:
+            self._update(job_id, status='failed', finished_at=time.time(), error=str(e))
+        finally:
+            for filepath in cleanup_paths:
+                self.file_service.cleanup_file(filepath)
+            self._flush(job_id, force=True)
+            # Taking the write lock waits out any flush already in progress;
+            # once the job is dropped no later write can replace the final state
+            with self._write_locks[job_id], self._lock:
+                self._jobs.pop(job_id, None)
+                self._last_flush.pop(job_id, None)
+                self._write_locks.pop(job_id, None)
+
+    def _record_item(self, job_id: str, key: str, item: Dict):
+        with self._lock:
+            job = self._jobs[job_id]
+            if item['success']:
+                job['results'].append(item)
+            else:
+                job['errors'].append({'key': key, 'error': item['error']})
+        self._flush(job_id)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+        self._flush(job_id, force=True)
+
+    def _start_heartbeat(self):
+        """Start the thread that refreshes the heartbeat of this process's jobs (once)"""
+        with self._lock:
+            if self._heartbeat is not None or self.heartbeat_interval <= 0:
+                return
+
+            def beat():
+                while True:
+                    time.sleep(self.heartbeat_interval)
+                    with self._lock:
+                        job_ids = list(self._jobs)
+                    for job_id in job_ids:
+                        try:
+                            self._update(job_id, heartbeat_at=time.time())
+                        except KeyError:
+                            pass  # Finished meanwhile
+                        except Exception as e:
+                            print(f"Error writing heartbeat for job {job_id}: {e}")
+
+            self._heartbeat = threading.Thread(target=beat, name='orato-job-heartbeat', daemon=True)
+            self._heartbeat.start()
+
+    def _flush(self, job_id: str, force: bool = False):
+        """Write job state to disk, throttled unless forced"""
+        with self._lock:
+            write_lock = self._write_locks.get(job_id)
+        if write_lock is None:
+            return
+
+        # Writes of one job are serialized, so the file always ends up with the
+        # state that was serialized last
+        with write_lock:
+            now = time.monotonic()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if not job:
+                    return
+                if not force and now - self._last_flush.get(job_id, 0) < self.FLUSH_INTERVAL:
+                    return
+                self._last_flush[job_id] = now
+                content = json.dumps(job)
+
+            path = self._job_path(job_id)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        if not self.JOB_ID_PATTERN.match(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return json.loads(json.dumps(job))
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job['status'] in ('queued', 'running') and self._is_abandoned(job):
+            job.update(status='failed', error='Job was interrupted by a worker restart; please resubmit it')
+        return job
+
+    def _is_abandoned(self, job: Dict) -> bool:
+        """Whether the process that owned an unfinished job is gone"""
+        heartbeat_at = job.get('heartbeat_at') or job['created_at']
+        if self.stale_seconds > 0 and time.time() - heartbeat_at > self.stale_seconds:
+            return True
+        owner = job.get('owner') or {}
+        if owner.get('host') != socket.gethostname():
+            return False
+        if owner.get('pid') == os.getpid():
+            # Jobs this process runs are answered from memory, so this one was
+            # left by an earlier process that had the same pid
+            return True
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            return True
+        except (OSError, KeyError, TypeError):
+            pass
+        return False
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _summary(self, job: Dict) -> Dict:
+        job_id = job['job_id']
+        return {
+            'job_id': job_id,
+            'status': job['status'],
+            'type': job['type'],
+            'provider': job['provider'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'progress': {
+                'total': job['total'],
+                'processed': len(job['results']),
+                'failed': len(job['errors'])
+            },
+            'error': job['error'],
+            'status_url': f'/api/batch/{job_id}',
+            'results_url': f'/api/batch/{job_id}/results',
+            'archive_url': f'/api/batch/{job_id}/archive'
+        }
@@ -0,0 +1,180 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Tuple
+from utils.config import Config
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge,
+                                   Histogram, generate_latest, multiprocess)
+except ImportError:  # metrics are optional
+    CollectorRegistry = None
+
+# In multiprocess mode every metric writes to a file in this directory. It is
+# cleared by gunicorn.conf.py, but must exist however the app was started.
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+class _NoopMetric:
+    """Stands in for a metric when prometheus-client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def observe(self, amount: float):
+        pass
+
+
+# Latency buckets in seconds, from cache hits to long syntheses
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+if CollectorRegistry is not None:
+    HTTP_REQUEST_DURATION = Histogram(
+        'orato_http_request_duration_seconds', 'HTTP request latency',
+        ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    HTTP_IN_FLIGHT = Gauge(
+        'orato_http_requests_in_flight', 'HTTP requests being handled',
+        ['route'], multiprocess_mode='livesum'
+    )
+    HTTP_BYTES = Counter(
+        'orato_http_bytes_total', 'HTTP body bytes received and sent',
+        ['route', 'direction']
+    )
+    PROVIDER_DURATION = Histogram(
+        'orato_provider_request_duration_seconds', 'Provider request latency',
+        ['provider', 'operation', 'region', 'voice'], buckets=LATENCY_BUCKETS
+    )
+    PROVIDER_IN_FLIGHT = Gauge(
+        'orato_provider_requests_in_flight', 'Provider requests in progress',
+        ['provider', 'operation'], multiprocess_mode='livesum'
+    )
+    PROVIDER_ERRORS = Counter(
+        'orato_provider_errors_total', 'Failed provider requests',
+        ['provider', 'operation', 'region', 'error']
+    )
+    PROVIDER_BYTES = Counter(
+        'orato_provider_audio_bytes_total', 'Audio bytes received from providers',
+        ['provider', 'operation']
+    )
+    BATCH_ITEM_DURATION = Histogram(
+        'orato_batch_item_duration_seconds', 'Batch item processing time',
+        ['provider', 'outcome'], buckets=LATENCY_BUCKETS
+    )
+else:
+    HTTP_REQUEST_DURATION = HTTP_IN_FLIGHT = HTTP_BYTES = _NoopMetric()
+    PROVIDER_DURATION = PROVIDER_IN_FLIGHT = PROVIDER_ERRORS = PROVIDER_BYTES = _NoopMetric()
+    BATCH_ITEM_DURATION = _NoopMetric()
+
+
+# Regions and voices come from client input, so only known values are used
+# as labels; anything else is counted as "other" to keep the series bounded
+OTHER_LABEL = 'other'
+_known_voices = set()
+
+
+def register_voices(voices: Iterable[str]):
+    """Allow voices as metric labels, e.g. a provider's defaults or catalog"""
+    _known_voices.update(voices)
+
+
+def region_label(region: str) -> str:
+    if not region:
+        return ''
+    return region if region in Config.AZURE_REGIONS or region in Config.AZURE_REGION_KEYS else OTHER_LABEL
+
+
+def voice_label(voice: str) -> str:
+    if not voice:
+        return ''
+    return voice if voice in _known_voices else OTHER_LABEL
+
+
+@contextmanager
+def track_provider_call(provider: str, operation: str, region: str = '', voice: str = '') -> Iterator[None]:
+    """Time a provider request, counting it as in flight and recording failures"""
+    region = region_label(region)
+    voice = voice_label(voice)
+    in_flight = PROVIDER_IN_FLIGHT.labels(provider, operation)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        PROVIDER_ERRORS.labels(provider, operation, region, type(e).__name__).inc()
+        raise
+    finally:
+        in_flight.dec()
+        PROVIDER_DURATION.labels(provider, operation, region, voice).observe(time.perf_counter() - started)
+
+
+def timed(function: Callable[[], Any], provider: str, operation: str,
+          region: str = '', voice: str = '') -> Callable[[], Any]:
+    """Wrap a provider call so that every attempt at it is tracked"""
+    def call():
+        with track_provider_call(provider, operation, region, voice):
+            return function()
+    return call
+
+
+def record_audio_bytes(provider: str, operation: str, size: int):
+    PROVIDER_BYTES.labels(provider, operation).inc(size)
+
+
+def init_app(app):
+    """Record latency, in-flight requests and body sizes for every Flask route"""
+    from flask import g, request
+
+    def route_label() -> str:
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = route_label()
+        HTTP_IN_FLIGHT.labels(g.metrics_route).inc()
+        if request.content_length:
+            HTTP_BYTES.labels(g.metrics_route, 'in').inc(request.content_length)
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = g.pop('metrics_route')
+            HTTP_IN_FLIGHT.labels(route).dec()
+            HTTP_REQUEST_DURATION.labels(route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+            # Streamed bodies have no length up front and are not counted
+            if response.content_length:
+                HTTP_BYTES.labels(route, 'out').inc(response.content_length)
+        return response
+
+    @app.teardown_request
+    def release_request(error=None):
+        # Requests that failed before after_request still leave the in-flight gauge
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            HTTP_IN_FLIGHT.labels(route).dec()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format.
+
+    Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so samples from every
+    worker are collected from the shared directory.
+    """
+    if CollectorRegistry is None:
+        raise RuntimeError('prometheus-client is not installed')
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
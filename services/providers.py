@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Callable, Dict
+
+# Provider services are created on first use and shared by every caller in
+# the process. The Azure service pulls in the Speech SDK's native library,
+# which is the bulk of a worker's boot time and memory, so it is only
+# imported once a request needs it.
+
+_services = {}
+_load_seconds = {}
+_lock = threading.Lock()
+
+
+def _create_azure():
+    from services.azure_service import AzureService
+    return AzureService()
+
+
+def _create_elevenlabs():
+    from services.elevenlabs_service import ElevenLabsService
+    return ElevenLabsService()
+
+
+_factories: Dict[str, Callable] = {
+    'azure': _create_azure,
+    'elevenlabs': _create_elevenlabs
+}
+
+
+def get_provider(name: str):
+    """Get the shared service for a provider, creating it on first use"""
+    service = _services.get(name)
+    if service is not None:
+        return service
+    with _lock:
+        service = _services.get(name)
+        if service is None:
+            started = time.perf_counter()
+            service = _factories[name]()
+            _load_seconds[name] = time.perf_counter() - started
+            _services[name] = service
+    return service
+
+
+def get_azure_service():
+    """Get the shared AzureService"""
+    return get_provider('azure')
+
+
+def get_elevenlabs_service():
+    """Get the shared ElevenLabsService"""
+    return get_provider('elevenlabs')
+
+
+def set_provider(name: str, service):
+    """Replace the shared service for a provider, e.g. with a fake in benchmarks"""
+    if name not in _factories:
+        raise ValueError(f'Unknown provider: {name}')
+    with _lock:
+        _services[name] = service
+        _load_seconds.pop(name, None)
+
+
+def preload():
+    """Create every provider service now instead of on first use"""
+    for name in _factories:
+        get_provider(name)
+
+
+def loaded_providers() -> Dict[str, float]:
+    """Get the seconds each provider created so far took to load"""
+    with _lock:
+        return {name: _load_seconds.get(name, 0.0) for name in _services}
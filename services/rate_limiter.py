@@ -0,0 +1,303 @@
+import contextvars
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from utils.config import Config
+from utils.sqlite import SQLiteDatabase
+
+
+class ThrottledError(RuntimeError):
+    """Raised when a provider rejects a call for exceeding its rate limit"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a call waited longer than allowed for its rate limit"""
+
+
+# Latest time (monotonic) calls in the current context may wait until
+_wait_deadline = contextvars.ContextVar('orato_rate_limit_deadline', default=None)
+
+
+@contextmanager
+def wait_deadline(seconds: float) -> Iterator[None]:
+    """Cap how long calls made in this context may wait for their rate limits"""
+    deadline = time.monotonic() + seconds
+    outer = _wait_deadline.get()
+    token = _wait_deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _wait_deadline.reset(token)
+
+
+class MemoryBucketStore:
+    """Token buckets held in process memory.
+
+    At most ``max_keys`` buckets are kept; the least recently used is
+    dropped first, which only refills it early if it was still in use.
+    """
+
+    def __init__(self, max_keys: int = 4096):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at, blocked_until]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take a token, returning 0, or the seconds to wait before one is available"""
+        with self._lock:
+            bucket = self._bucket(key, [burst, now, 0.0])
+            bucket[0], bucket[1] = _refill(bucket[0], bucket[1], rate, burst, now), now
+            if now < bucket[2]:
+                return bucket[2] - now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def block(self, key: str, until: float):
+        """Stop handing out tokens for key until the given time"""
+        with self._lock:
+            bucket = self._bucket(key, [0.0, until, 0.0])
+            bucket[2] = max(bucket[2], until)
+
+    def _bucket(self, key: str, default: list) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+            return bucket
+        self._buckets[key] = default
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return default
+
+
+class SQLiteBucketStore:
+    """Token buckets in a sqlite database, shared by every worker process on a host.
+
+    Buckets untouched for ``idle_seconds`` and not blocked are deleted
+    every ``PRUNE_INTERVAL`` seconds; by then they have refilled, so a
+    fresh bucket is equivalent.
+    """
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path: str, idle_seconds: float = 3600):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self._pruned_at = 0.0
+        self._db = SQLiteDatabase(path)
+        connection = self._db.connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+            'updated_at REAL NOT NULL, blocked_until REAL NOT NULL)'
+        )
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        if now - self._pruned_at >= self.PRUNE_INTERVAL:
+            self._pruned_at = now
+            self.prune(now)
+        with self._db.transaction() as connection:
+            row = connection.execute(
+                'SELECT tokens, updated_at, blocked_until FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated_at, blocked_until = row if row else (burst, now, 0.0)
+            tokens = _refill(tokens, updated_at, rate, burst, now)
+
+            wait = 0.0
+            if now < blocked_until:
+                wait = blocked_until - now
+            elif tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, blocked_until)
+            )
+            return wait
+
+    def block(self, key: str, until: float):
+        with self._db.transaction() as connection:
+            connection.execute(
+                'INSERT INTO buckets (key, tokens, updated_at, blocked_until) VALUES (?, 0, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)',
+                (key, until, until)
+            )
+
+    def prune(self, now: float):
+        """Delete buckets that have been idle for idle_seconds and are not blocked"""
+        with self._db.transaction() as connection:
+            connection.execute(
+                'DELETE FROM buckets WHERE updated_at < ? AND blocked_until < ?',
+                (now - self.idle_seconds, now)
+            )
+
+
+
+def _refill(tokens: float, updated_at: float, rate: float, burst: float, now: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+class RateLimiter:
+    """Token-bucket rate limiter and concurrency cap per provider and API key.
+
+    Calls that would exceed the limit wait for their turn instead of
+    failing. When a provider throttles a key anyway (HTTP 429 or an Azure
+    TooManyRequests cancellation), the key is blocked for the Retry-After
+    period, or an exponential backoff without one, and the call is retried.
+    Token buckets live in ``store``, which may be shared across worker
+    processes; concurrency caps apply per process. Per-key state in this
+    process is kept for at most ``max_keys`` keys, least recently used
+    first out; a concurrency cap is only dropped once no call holds it.
+    """
+
+    BACKOFF_BASE = 1.0  # seconds, doubled for each consecutive throttle
+    BACKOFF_MAX = 60.0
+
+    def __init__(self, limits: Dict[str, Dict[str, float]], store=None,
+                 max_wait: float = 120, max_retries: int = 3, max_keys: int = 4096):
+        self.limits = limits
+        self.store = store or MemoryBucketStore(max_keys)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.max_keys = max_keys
+        self._semaphores = OrderedDict()  # key -> [semaphore, calls using it]
+        self._strikes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def call(self, provider: str, api_key: str, operation: Callable[[], Any], hold_slot: bool = True) -> Any:
+        """Run operation within the limits for provider and api_key, retrying when throttled.
+
+        With hold_slot=False the call takes a token but no concurrency slot,
+        for long sessions that would otherwise starve short requests.
+        """
+        attempt = 0
+        while True:
+            with self.acquire(provider, api_key, hold_slot):
+                try:
+                    result = operation()
+                except Exception as e:
+                    delay = self._throttle_delay(provider, api_key, e)
+                    if delay is None or attempt >= self.max_retries:
+                        raise
+                    self.block(provider, api_key, delay)
+                    attempt += 1
+                    continue
+            self._reset(provider, api_key)
+            return result
+
+    @contextmanager
+    def acquire(self, provider: str, api_key: str, hold_slot: bool = True) -> Iterator[None]:
+        """Wait for a token and a concurrency slot, holding the slot until exit"""
+        deadline = self._deadline()
+        entry = self._semaphore(provider, api_key) if hold_slot else None
+        try:
+            if entry is not None and not entry[0].acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise RateLimitTimeout(f'Timed out waiting for a {provider} request slot')
+            try:
+                self.wait(provider, api_key, deadline)
+                yield
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry[1] -= 1
+
+    def wait(self, provider: str, api_key: str, deadline: Optional[float] = None):
+        """Block until a token is available for provider and api_key"""
+        limit = self.limits.get(provider, {})
+        rate = limit.get('rate') or 0
+        if rate <= 0:
+            return
+        if deadline is None:
+            deadline = self._deadline()
+
+        key = self._key(provider, api_key)
+        while True:
+            delay = self.store.take(key, rate, max(limit.get('burst') or 1, 1), time.time())
+            if delay <= 0:
+                return
+            if time.monotonic() + delay > deadline:
+                raise RateLimitTimeout(f'Timed out waiting for the {provider} rate limit')
+            time.sleep(delay)
+
+    def block(self, provider: str, api_key: str, seconds: float):
+        """Hold back every call for provider and api_key for the given time"""
+        self.store.block(self._key(provider, api_key), time.time() + seconds)
+
+    def _deadline(self) -> float:
+        """Get when a wait starting now must give up, within any wait_deadline in effect"""
+        deadline = time.monotonic() + self.max_wait
+        outer = _wait_deadline.get()
+        return deadline if outer is None else min(deadline, outer)
+
+    def _throttle_delay(self, provider: str, api_key: str, error: Exception) -> Optional[float]:
+        """Get the backoff for a throttling error, or None for any other error"""
+        if not (isinstance(error, ThrottledError) or getattr(error, 'status_code', None) == 429):
+            return None
+        retry_after = getattr(error, 'retry_after', None)
+        key = self._key(provider, api_key)
+        with self._lock:
+            strikes = self._strikes.pop(key, 0)
+            self._strikes[key] = strikes + 1
+            while len(self._strikes) > self.max_keys:
+                self._strikes.popitem(last=False)
+        if retry_after:
+            return retry_after
+        return min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** strikes)
+
+    def _reset(self, provider: str, api_key: str):
+        if self._strikes:
+            with self._lock:
+                self._strikes.pop(self._key(provider, api_key), None)
+
+    def _semaphore(self, provider: str, api_key: str) -> Optional[list]:
+        """Get the [semaphore, users] entry for a key, counting the caller as a user"""
+        concurrency = int(self.limits.get(provider, {}).get('concurrency') or 0)
+        if concurrency <= 0:
+            return None
+        key = self._key(provider, api_key)
+        with self._lock:
+            entry = self._semaphores.get(key)
+            if entry is None:
+                entry = [threading.BoundedSemaphore(concurrency), 1]
+                self._semaphores[key] = entry
+                self._evict_semaphores()
+            else:
+                self._semaphores.move_to_end(key)
+                entry[1] += 1
+            return entry
+
+    def _evict_semaphores(self):
+        """Drop the least recently used semaphores no call is using, down to max_keys"""
+        excess = len(self._semaphores) - self.max_keys
+        if excess <= 0:
+            return
+        for key in [key for key, entry in self._semaphores.items() if entry[1] == 0][:excess]:
+            del self._semaphores[key]
+
+    @staticmethod
+    def _key(provider: str, api_key: str) -> str:
+        # Keys are stored hashed so the shared store never holds credentials
+        return f"{provider}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]}"
+
+
+rate_limiter = RateLimiter(
+    Config.RATE_LIMITS,
+    store=SQLiteBucketStore(Config.RATE_LIMIT_STORE) if Config.RATE_LIMIT_STORE else None,
+    max_wait=Config.RATE_LIMIT_MAX_WAIT,
+    max_retries=Config.RATE_LIMIT_MAX_RETRIES,
+    max_keys=Config.RATE_LIMIT_MAX_KEYS
+)
@@ -0,0 +1,184 @@
+import contextvars
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple
+from services.rate_limiter import RateLimitTimeout, ThrottledError
+from services.resilience import CircuitOpenError, is_transient
+from utils.config import Config
+
+AUTO_REGION = 'auto'
+
+
+def is_regional_failure(error: Exception) -> bool:
+    """Whether an error is down to the region (worth trying another) rather than the request"""
+    return is_transient(error) or isinstance(error, (CircuitOpenError, ThrottledError, RateLimitTimeout,
+                                                     ConnectionError, TimeoutError))
+
+
+class RegionRouter:
+    """Route Azure calls across the regions we hold keys for.
+
+    Each region keeps a rolling window of call outcomes. Calls go to the
+    healthy region with the lowest median latency; a region whose error rate
+    crosses the threshold is tried last until its cooldown has passed. A call
+    that fails for a regional reason (see ``is_regional_failure``) is retried
+    in the next region; any other error is the request's own and is raised
+    as is, without counting against the region. With ``hedge_delay`` set, a
+    hedgeable call still running after that many seconds is hedged by
+    starting the same call in the next region, taking whichever succeeds
+    first. The losing call still runs to completion and is billed, so only
+    short calls of a predictable length should be hedged.
+    """
+
+    def __init__(self, region_keys: Dict[str, str], window: int = 50,
+                 error_threshold: float = 0.5, cooldown: float = 30,
+                 max_attempts: int = 2, hedge_delay: float = 0, max_workers: int = 32):
+        self.region_keys = dict(region_keys)
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.max_attempts = max(1, max_attempts)
+        self.hedge_delay = hedge_delay
+        self.max_workers = max_workers
+        self._outcomes = {region: deque(maxlen=window) for region in self.region_keys}
+        self._failed_at = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.region_keys)
+
+    def select(self) -> Tuple[str, str]:
+        """Get the (api_key, region) of the best region, for calls that cannot fail over"""
+        region = self.ranked()[0]
+        return self.region_keys[region], region
+
+    def ranked(self) -> List[str]:
+        """Get regions ordered from most to least preferred"""
+        if not self.enabled:
+            raise ValueError('No Azure region keys configured (AZURE_REGION_KEYS)')
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.region_keys, key=lambda region: self._score(region, now))
+
+    def call(self, operation: Callable[[str, str], Any], hedge: bool = True) -> Tuple[Any, Dict]:
+        """Run operation(api_key, region), failing over and, if hedge is set, hedging across regions.
+
+        Returns the result with the routing decision. If every attempt fails,
+        the last error is raised.
+        """
+        candidates = self.ranked()[:self.max_attempts]
+        executor = self._get_executor()
+        attempts = []
+        decision = {'region': None, 'attempts': attempts, 'hedged': False}
+        pending = {}
+        last_error = None
+
+        def launch():
+            region = candidates[len(attempts) + len(pending)]
+            # Attempts keep the caller's context, e.g. its rate limit deadline
+            context = contextvars.copy_context()
+            pending[executor.submit(context.run, self._timed, operation, region)] = region
+
+        launch()
+        while pending:
+            can_hedge = hedge and self.hedge_delay > 0 and len(attempts) + len(pending) < len(candidates)
+            done, _ = wait(pending, timeout=self.hedge_delay if can_hedge else None,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                decision['hedged'] = True
+                launch()
+                continue
+
+            for future in done:
+                region = pending.pop(future)
+                latency, value, error = future.result()
+                attempt = {'region': region, 'latency': round(latency, 3), 'success': error is None}
+                if error is not None:
+                    attempt['error'] = str(error)
+                    last_error = error
+                attempts.append(attempt)
+                if error is not None and not is_regional_failure(error):
+                    # Another region would fail the same way and bill it again
+                    raise error
+                if error is None:
+                    # A hedged call still running finishes in the background
+                    decision['region'] = region
+                    return value, decision
+
+            if not pending and len(attempts) < len(candidates):
+                launch()
+
+        raise last_error
+
+    def record(self, region: str, latency: float, success: bool):
+        """Record the outcome of a call to a region"""
+        with self._lock:
+            outcomes = self._outcomes.get(region)
+            if outcomes is None:
+                return
+            outcomes.append((latency, success))
+            if not success:
+                self._failed_at[region] = time.monotonic()
+
+    def stats(self) -> Dict:
+        """Get rolling latency and error rate per region, in routing order"""
+        now = time.monotonic()
+        with self._lock:
+            regions = sorted(self.region_keys, key=lambda region: self._score(region, now))
+            return {
+                'enabled': self.enabled,
+                'hedge_delay': self.hedge_delay,
+                'regions': [
+                    {'region': region, **self._region_stats(region, now)}
+                    for region in regions
+                ]
+            }
+
+    def _timed(self, operation: Callable[[str, str], Any], region: str):
+        started = time.monotonic()
+        try:
+            value, error = operation(self.region_keys[region], region), None
+        except Exception as e:
+            value, error = None, e
+        latency = time.monotonic() - started
+        if error is None or is_regional_failure(error):
+            self.record(region, latency, error is None)
+        return latency, value, error
+
+    def _score(self, region: str, now: float) -> Tuple[bool, float]:
+        stats = self._region_stats(region, now)
+        # Regions without samples sort first so they get measured
+        return not stats['healthy'], stats['median_latency'] or 0.0
+
+    def _region_stats(self, region: str, now: float) -> Dict:
+        outcomes = self._outcomes[region]
+        latencies = [latency for latency, success in outcomes if success]
+        error_rate = (len(outcomes) - len(latencies)) / len(outcomes) if outcomes else 0.0
+        cooling_down = now - self._failed_at.get(region, float('-inf')) < self.cooldown
+        return {
+            'samples': len(outcomes),
+            'error_rate': error_rate,
+            'median_latency': statistics.median(latencies) if latencies else None,
+            'healthy': not (error_rate >= self.error_threshold and cooling_down)
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='orato-route')
+            return self._executor
+
+
+region_router = RegionRouter(
+    Config.AZURE_REGION_KEYS,
+    window=Config.AZURE_ROUTING_WINDOW,
+    error_threshold=Config.AZURE_ROUTING_ERROR_THRESHOLD,
+    cooldown=Config.AZURE_ROUTING_COOLDOWN,
+    max_attempts=Config.AZURE_ROUTING_MAX_ATTEMPTS,
+    hedge_delay=Config.AZURE_HEDGE_DELAY
+)
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from services.rate_limiter import rate_limiter
+from utils.config import Config
+
+
+class ProviderError(RuntimeError):
+    """Provider failure classified as transient (worth retrying) or permanent"""
+
+    def __init__(self, message: str, transient: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while its circuit is open"""
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an error is a temporary provider failure worth retrying"""
+    return bool(getattr(error, 'transient', False))
+
+
+class CircuitBreaker:
+    """Fail fast while a provider keeps failing.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens and calls fail immediately. Once ``recovery_timeout`` has passed a
+    single probe call is let through; its outcome closes the circuit again
+    or keeps it open for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(
+                    f'{self.name} circuit is open after repeated failures; retry in {max(remaining, 0):.0f}s'
+                )
+            self._probing = True
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            if self._opened_at is None:
+                state = 'closed'
+            elif self._probing or time.monotonic() - self._opened_at >= self.recovery_timeout:
+                state = 'half_open'
+            else:
+                state = 'open'
+            return {'name': self.name, 'state': state, 'consecutive_failures': self._failures}
+
+
+class ProviderGuard:
+    """Retry transient provider failures with jittered backoff behind a circuit breaker"""
+
+    def __init__(self, breaker: CircuitBreaker, max_attempts: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8):
+        self.breaker = breaker
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, operation: Callable[[], Any]) -> Any:
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            try:
+                result = operation()
+            except Exception as e:
+                self.record(e)
+                if not is_transient(e) or attempt >= self.max_attempts or self.breaker.is_open:
+                    raise
+                time.sleep(self._backoff(attempt, getattr(e, 'retry_after', None)))
+                attempt += 1
+                continue
+            self.record()
+            return result
+
+    def record(self, error: Optional[Exception] = None):
+        """Count the outcome of a call made outside call(), such as the rest of a stream"""
+        if error is None or not is_transient(error):
+            # The provider answered, so it is up even if the call failed
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after:
+            return retry_after
+        # Full jitter keeps retries from concurrent requests from lining up
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(provider: str, scope: Optional[str] = None) -> ProviderGuard:
+    """Get the guard for a provider, optionally scoped to a known Azure region.
+
+    Scopes come from client input, so an unknown one shares the provider's
+    unscoped guard rather than adding a breaker per value.
+    """
+    if scope not in Config.AZURE_REGIONS and scope not in Config.AZURE_REGION_KEYS:
+        scope = None
+    name = f'{provider}:{scope}' if scope else provider
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            breaker = CircuitBreaker(name, Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RECOVERY_SECONDS)
+            guard = ProviderGuard(breaker, Config.PROVIDER_RETRY_ATTEMPTS,
+                                  Config.PROVIDER_RETRY_BASE_DELAY, Config.PROVIDER_RETRY_MAX_DELAY)
+            _guards[name] = guard
+        return guard
+
+
+def protected_call(provider: str, api_key: str, operation: Callable[[], Any],
+                   scope: Optional[str] = None, hold_slot: bool = True) -> Any:
+    """Run a provider request behind its circuit breaker, retries and rate limit"""
+    return get_guard(provider, scope).call(lambda: rate_limiter.call(provider, api_key, operation, hold_slot))
+
+
+def circuit_stats() -> Dict:
+    """Get the state of every circuit breaker in this process"""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {'circuits': [guard.breaker.stats() for guard in guards]}
@@ -0,0 +1,165 @@
+import azure.cognitiveservices.speech as speechsdk
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from utils.config import Config
+
+class SpeechClientPool:
+    """Pool of warmed Azure speech synthesizers.
+
+    Synthesizers are keyed by (api_key, region, language, voice, output
+    format) and handed out exclusively, since a synthesizer must not run two
+    syntheses at once. New synthesizers pre-open their service connection so
+    the TLS/websocket setup is paid once instead of per request. Idle entries
+    expire after ``idle_timeout`` seconds and the pool never holds more than
+    ``max_size`` idle synthesizers.
+
+    Recognizers are bound to their audio input and cannot be reused across
+    requests, so only their SpeechConfig objects are cached.
+    """
+
+    def __init__(self, max_size: int = 32, idle_timeout: float = 300, preconnect: bool = True):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.preconnect = preconnect
+        self._idle: Dict[tuple, List[Dict]] = {}
+        self._idle_count = 0
+        self._recognition_configs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def synthesizer(self, api_key: str, region: str, lang_code: str, voice: str,
+                    output_format=None) -> Iterator[speechsdk.SpeechSynthesizer]:
+        """Lease a synthesizer with audio routed to the result (no audio output config).
+
+        The synthesizer is returned to the pool when the block exits normally
+        and discarded if it raises.
+        """
+        key = (api_key, region, lang_code, voice, output_format)
+        entry = self._acquire(key)
+        if entry is None:
+            entry = self._create(api_key, region, lang_code, voice, output_format)
+
+        try:
+            yield entry['synthesizer']
+        except BaseException:
+            self._close(entry)
+            raise
+        else:
+            self._release(key, entry)
+
+    def recognition_config(self, api_key: str, region: str, lang_code: str) -> speechsdk.SpeechConfig:
+        """Get a shared SpeechConfig for recognition"""
+        key = (api_key, region, lang_code)
+        with self._lock:
+            config = self._recognition_configs.get(key)
+            if config is not None:
+                self._recognition_configs.move_to_end(key)
+                return config
+
+        config = speechsdk.SpeechConfig(subscription=api_key, region=region)
+        config.speech_recognition_language = lang_code
+
+        with self._lock:
+            self._recognition_configs[key] = config
+            while len(self._recognition_configs) > self.max_size:
+                self._recognition_configs.popitem(last=False)
+        return config
+
+    def stats(self) -> Dict:
+        """Get the number of idle pooled clients"""
+        with self._lock:
+            return {
+                'idle_synthesizers': self._idle_count,
+                'recognition_configs': len(self._recognition_configs),
+                'max_size': self.max_size
+            }
+
+    def _acquire(self, key: tuple) -> Optional[Dict]:
+        evicted = []
+        entry = None
+        with self._lock:
+            self._expire_idle(evicted)
+            entries = self._idle.get(key)
+            if entries:
+                entry = entries.pop()
+                if not entries:
+                    del self._idle[key]
+                self._idle_count -= 1
+        for old in evicted:
+            self._close(old)
+        return entry
+
+    def _release(self, key: tuple, entry: Dict):
+        entry['last_used'] = time.monotonic()
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(entry)
+            self._idle_count += 1
+            self._expire_idle(evicted)
+            while self._idle_count > self.max_size:
+                evicted.append(self._pop_oldest())
+        for old in evicted:
+            self._close(old)
+
+    def _expire_idle(self, evicted: List[Dict]):
+        """Move idle entries older than idle_timeout to evicted (caller holds the lock)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in list(self._idle):
+            entries = self._idle[key]
+            fresh = [entry for entry in entries if entry['last_used'] >= cutoff]
+            if len(fresh) == len(entries):
+                continue
+            evicted.extend(entry for entry in entries if entry['last_used'] < cutoff)
+            self._idle_count -= len(entries) - len(fresh)
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+    def _pop_oldest(self) -> Dict:
+        """Remove the least recently used idle entry (caller holds the lock)"""
+        oldest_key = min(self._idle, key=lambda k: self._idle[k][0]['last_used'])
+        entries = self._idle[oldest_key]
+        entry = entries.pop(0)
+        if not entries:
+            del self._idle[oldest_key]
+        self._idle_count -= 1
+        return entry
+
+    def _create(self, api_key: str, region: str, lang_code: str, voice: str, output_format) -> Dict:
+        speech_config = speechsdk.SpeechConfig(subscription=api_key, region=region)
+        speech_config.speech_synthesis_language = lang_code
+        speech_config.speech_synthesis_voice_name = voice
+        if output_format is not None:
+            speech_config.set_speech_synthesis_output_format(output_format)
+
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+
+        connection = None
+        if self.preconnect:
+            try:
+                connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+                connection.open(True)
+            except Exception as e:
+                # The synthesizer still connects lazily on first use
+                print(f"Error pre-connecting speech synthesizer: {e}")
+
+        return {'synthesizer': synthesizer, 'connection': connection, 'last_used': time.monotonic()}
+
+    @staticmethod
+    def _close(entry: Dict):
+        try:
+            if entry['connection'] is not None:
+                entry['connection'].close()
+        except Exception:
+            pass
+
+
+speech_pool = SpeechClientPool(
+    max_size=Config.SPEECH_POOL_MAX_SIZE,
+    idle_timeout=Config.SPEECH_POOL_IDLE_SECONDS,
+    preconnect=Config.SPEECH_POOL_PRECONNECT
+)
@@ -0,0 +1,118 @@
+import os
+from typing import Optional
+from utils.config import Config
+
+
+class StorageBackend:
+    """Where finished outputs are kept so that any replica can serve them.
+
+    Uploads are scratch files consumed by the request or job that received
+    them, so every backend stages them on local disk. Outputs are written
+    locally first and then published; a replica that does not hold a file
+    locally asks the backend for a URL to send the client to.
+    """
+
+    publishes = False  # Whether publish() does any work, so callers can skip scheduling it
+
+    def save_upload(self, file, filepath: str):
+        """Store an uploaded file at a local path for processing"""
+        file.save(filepath)
+
+    def cleanup(self, filepath: str):
+        """Remove a local scratch file"""
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    def publish(self, filename: str, filepath: str):
+        """Make a finished output available to other replicas"""
+
+    def download_url(self, filename: str) -> Optional[str]:
+        """Get a URL serving an output this replica does not hold, or None if there is none"""
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    """Outputs stay on this node's disk; only requests reaching this node can download them"""
+
+
+class S3StorageBackend(StorageBackend):
+    """Outputs are copied to an S3-compatible bucket and served from presigned URLs.
+
+    Files are uploaded with streamed multipart transfers once they exceed
+    ``multipart_threshold``. Set ``endpoint_url`` for MinIO or another
+    S3-compatible service. Objects are not deleted by the app; expire them
+    with a bucket lifecycle rule matching ``DOWNLOAD_TTL_HOURS``. Pass
+    ``client`` to use an existing boto3 S3 client (or a stand-in for one).
+    """
+
+    publishes = True
+
+    def __init__(self, bucket: str, prefix: str = 'downloads/', endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, access_key_id: Optional[str] = None,
+                 secret_access_key: Optional[str] = None, url_expiry: int = 3600,
+                 multipart_threshold: int = 8 * 1024 * 1024, multipart_chunk_size: int = 8 * 1024 * 1024,
+                 client=None):
+        # boto3 is slow to import and only needed by this backend
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.client import Config as BotoConfig
+        except ImportError:
+            raise RuntimeError('boto3 is required for the s3 storage backend')
+        if not bucket:
+            raise ValueError('S3_BUCKET is required for the s3 storage backend')
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expiry = url_expiry
+        self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold,
+                                              multipart_chunksize=multipart_chunk_size)
+        # S3-compatible services behind a custom endpoint usually need path-style addressing
+        self.client = client or boto3.client(
+            's3', endpoint_url=endpoint_url or None, region_name=region or None,
+            aws_access_key_id=access_key_id or None, aws_secret_access_key=secret_access_key or None,
+            config=BotoConfig(signature_version='s3v4',
+                              s3={'addressing_style': 'path' if endpoint_url else 'auto'})
+        )
+
+    def publish(self, filename: str, filepath: str):
+        self.client.upload_file(filepath, self.bucket, self._key(filename), Config=self.transfer_config)
+
+    def download_url(self, filename: str) -> Optional[str]:
+        from botocore.exceptions import ClientError
+        key = self._key(filename)
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return self.client.generate_presigned_url('get_object', ExpiresIn=self.url_expiry, Params={
+            'Bucket': self.bucket,
+            'Key': key,
+            'ResponseContentDisposition': f'attachment; filename="{filename}"'
+        })
+
+    def _key(self, filename: str) -> str:
+        return f'{self.prefix}{filename}'
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Create the storage backend selected by name ('local' or 's3')"""
+    if name == 's3':
+        return S3StorageBackend(
+            Config.S3_BUCKET,
+            prefix=Config.S3_PREFIX,
+            endpoint_url=Config.S3_ENDPOINT_URL,
+            region=Config.S3_REGION,
+            access_key_id=Config.S3_ACCESS_KEY_ID,
+            secret_access_key=Config.S3_SECRET_ACCESS_KEY,
+            url_expiry=Config.S3_URL_EXPIRY,
+            multipart_threshold=Config.S3_MULTIPART_THRESHOLD,
+            multipart_chunk_size=Config.S3_MULTIPART_CHUNK_SIZE
+        )
+    if name in ('', 'local'):
+        return LocalStorageBackend()
+    raise ValueError(f'Unknown storage backend: {name}')
+
+
+storage_backend = create_backend(Config.STORAGE_BACKEND)
@@ -0,0 +1,234 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from services.download_store import DownloadStore, download_store
+from utils.config import Config
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized audio files.
+
+    Outputs are stored in the download store under a name derived from an
+    HMAC of (provider, voice, language, text, output format, scope), so
+    identical requests map to the same file in every worker process while
+    names cannot be guessed from the text without the secret. Requests with
+    different scopes (e.g. ElevenLabs API keys, whose voices may be private)
+    never share an entry. Each process keeps an LRU index of
+    the entries it has seen and evicts by count, total size and idle age.
+    Hits refresh the file mtime and push back its expiry in the store's
+    index, so the reaper keeps frequently used entries. Concurrent misses
+    for the same key wait for the first one instead of synthesizing again;
+    no lock is held while synthesizing.
+    """
+
+    def __init__(self, store: Optional[DownloadStore] = None, max_entries: int = 10000,
+                 max_bytes: int = 1024 * 1024 * 1024, max_age_seconds: float = 24 * 3600,
+                 enabled: bool = True, secret: Optional[bytes] = None):
+        self.store = store or download_store
+        self.secret = secret or secrets.token_bytes(32)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self._entries = OrderedDict()  # filename -> size in bytes
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Event set when its synthesis finishes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def make_key(self, provider: str, voice: Optional[str], language: Optional[str], text: str,
+                 output_format: Optional[str] = None, scope: Optional[str] = None) -> str:
+        """Build the cache key for a synthesis request"""
+        fields = [provider, voice or '', language or '', text, output_format or '']
+        if scope:
+            fields.append(hashlib.sha256(scope.encode('utf-8')).hexdigest())
+        payload = '\x1f'.join(fields)
+        return hmac.new(self.secret, payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def get_or_create(self, provider: str, voice: Optional[str], language: Optional[str],
+                      text: str, extension: str, synthesize: Callable[[str], Dict],
+                      output_format: Optional[str] = None, scope: Optional[str] = None) -> Dict:
+        """Return a cached output file, calling synthesize(filepath) on a miss.
+
+        Extra fields of the synthesize result are passed through on a miss.
+        """
+        if not self.enabled:
+            filename = f"{provider}_tts_{uuid.uuid4().hex}.{extension}"
+            result = synthesize(self.store.prepare(filename))
+            if result['success']:
+                self.store.register(filename)
+                return {**result, 'filename': filename, 'cached': False}
+            return result
+
+        key, filename, filepath = self._entry(provider, voice, language, text, extension, output_format, scope)
+
+        while True:
+            if self._is_fresh(filepath):
+                self._touch(filename, filepath)
+                with self._lock:
+                    self._hits += 1
+                return {'success': True, 'filename': filename, 'cached': True}
+
+            # The first miss for a key synthesizes it; later ones wait for it
+            with self._lock:
+                done = self._in_flight.get(key)
+                if done is None:
+                    done = self._in_flight[key] = threading.Event()
+                    self._misses += 1
+                    break
+            done.wait()
+            # Check the file again; if that synthesis failed, try it ourselves
+
+        try:
+            temp_path = self.store.partial_path(filename)
+            try:
+                result = synthesize(temp_path)
+                if not result['success']:
+                    return result
+                os.replace(temp_path, self.store.prepare(filename))
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            self.store.register(filename, self.max_age_seconds)
+            self._record(filename, filepath)
+            return {**result, 'filename': filename, 'cached': False}
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            done.set()
+
+    def lookup(self, provider: str, voice: Optional[str], language: Optional[str],
+               text: str, extension: str, output_format: Optional[str] = None,
+               scope: Optional[str] = None) -> Optional[Dict]:
+        """Return a cached output file if one exists, without synthesizing"""
+        if not self.enabled:
+            return None
+
+        _, filename, filepath = self._entry(provider, voice, language, text, extension, output_format, scope)
+        if not self._is_fresh(filepath):
+            return None
+
+        self._touch(filename, filepath)
+        with self._lock:
+            self._hits += 1
+        return {'success': True, 'filename': filename, 'cached': True}
+
+    def prune(self):
+        """Drop index entries whose files were removed or have gone stale"""
+        with self._lock:
+            for filename in list(self._entries):
+                if not self._is_fresh(self.store.path(filename)):
+                    self._drop(filename, delete=True)
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and current cache size"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+    def _entry(self, provider: str, voice: Optional[str], language: Optional[str],
+               text: str, extension: str, output_format: Optional[str] = None, scope: Optional[str] = None):
+        """Get the cache key, filename and filepath for a synthesis request"""
+        key = self.make_key(provider, voice, language, text, output_format, scope)
+        filename = f"{provider}_tts_{key[:32]}.{extension}"
+        return key, filename, self.store.path(filename)
+
+    def _is_fresh(self, filepath: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(filepath) <= self.max_age_seconds
+        except OSError:
+            return False
+
+    def _touch(self, filename: str, filepath: str):
+        try:
+            os.utime(filepath, None)
+        except OSError:
+            pass
+        self.store.touch(filename, self.max_age_seconds)
+        with self._lock:
+            if filename in self._entries:
+                self._entries.move_to_end(filename)
+            else:
+                self._add(filename, filepath)
+            self._evict()
+
+    def _record(self, filename: str, filepath: str):
+        with self._lock:
+            if filename in self._entries:
+                self._drop(filename, delete=False)
+            self._add(filename, filepath)
+            self._evict()
+
+    def _add(self, filename: str, filepath: str):
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return
+        self._entries[filename] = size
+        self._total_bytes += size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._total_bytes > self.max_bytes):
+            filename = next(iter(self._entries))
+            self._drop(filename, delete=True)
+            self._evictions += 1
+
+    def _drop(self, filename: str, delete: bool):
+        self._total_bytes -= self._entries.pop(filename, 0)
+        if delete:
+            self.store.remove(filename)
+
+
+def load_secret(value: str, path: str) -> bytes:
+    """Get the configured cache secret, or one generated once and shared through a file"""
+    if value:
+        return value.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secrets.token_bytes(32))
+    try:
+        # Linking fails if another worker created the file first; theirs wins
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+tts_cache = TTSCache(
+    store=download_store,
+    max_entries=Config.TTS_CACHE_MAX_ENTRIES,
+    max_bytes=Config.TTS_CACHE_MAX_BYTES,
+    max_age_seconds=Config.TTS_CACHE_MAX_AGE_HOURS * 3600,
+    enabled=Config.TTS_CACHE_ENABLED,
+    secret=load_secret(Config.TTS_CACHE_SECRET, Config.TTS_CACHE_SECRET_PATH)
+)
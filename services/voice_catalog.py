@@ -0,0 +1,103 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+
+class VoiceCatalog:
+    """In-memory cache of provider voice catalogs, per provider, region and API key.
+
+    Entries younger than ``ttl`` are served as is. Older entries are still
+    served for up to ``stale_seconds`` more while a single background fetch
+    refreshes them (stale-while-revalidate); past that, the request waits
+    for a fresh fetch, falling back to the stale copy if the fetch fails.
+    """
+
+    def __init__(self, fetchers: Dict[str, Callable[[str, str], List[Dict]]],
+                 ttl: float = 3600, stale_seconds: float = 24 * 3600, max_entries: int = 256):
+        self.fetchers = fetchers
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> {'voices', 'etag', 'fetched_at'}
+        self._refreshing = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='orato-voices')
+
+    def get(self, provider: str, api_key: str, region: str) -> Dict:
+        """Get the catalog for a provider and key, fetching it if needed"""
+        key = self._key(provider, api_key, region)
+        entry = self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry['fetched_at']
+            if age <= self.ttl:
+                return entry
+            if age <= self.ttl + self.stale_seconds:
+                self._refresh_in_background(key, provider, api_key, region)
+                return entry
+
+        # Only one request per key fetches; the others wait for its result
+        with self._key_lock(key):
+            current = self._lookup(key)
+            if current is not None and current is not entry:
+                return current
+            try:
+                return self._fetch(key, provider, api_key, region)
+            except Exception:
+                if entry is not None:
+                    return entry
+                raise
+
+    def _fetch(self, key: tuple, provider: str, api_key: str, region: str) -> Dict:
+        voices = self.fetchers[provider](api_key, region)
+        content = json.dumps(voices, sort_keys=True).encode('utf-8')
+        entry = {
+            'voices': voices,
+            'etag': hashlib.sha256(content).hexdigest(),
+            'fetched_at': time.time()
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+        return entry
+
+    def _refresh_in_background(self, key: tuple, provider: str, api_key: str, region: str):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._fetch(key, provider, api_key, region)
+            except Exception as e:
+                print(f"Error refreshing {provider} voice catalog: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def _lookup(self, key: tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _key(provider: str, api_key: str, region: str) -> tuple:
+        # Keys are held hashed so the cache never keeps credentials around
+        return provider, region or '', hashlib.sha256(api_key.encode('utf-8')).hexdigest()
@@ -418,15 +418,33 @@ class OratoApp {
             });
 
             const result = await response.json();
-            
+
             if (result.success) {
-                document.getElementById('batch-text').textContent = result.message;
+                document.getElementById('batch-text').textContent = 'Batch queued...';
                 document.getElementById('batch-result').style.display = 'block';
-                
-                // Show download link for ZIP file
-                const downloadLink = document.getElementById('batch-download-link');
-                downloadLink.href = result.download_url;
-                downloadLink.style.display = 'block';
+
+                // Poll the job until every item has been processed
+                let job = result;
+                while (job.status === 'queued' || job.status === 'running') {
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                    const statusResponse = await fetch(result.status_url);
+                    job = await statusResponse.json();
+
+                    const done = job.progress.processed + job.progress.failed;
+                    const total = job.progress.total === null ? '?' : job.progress.total;
+                    button.innerHTML = `<i class="fas fa-spinner fa-spin"></i> Processing ${done}/${total}...`;
+                }
+
+                if (job.status === 'completed') {
+                    document.getElementById('batch-text').textContent =
+                        `Processed ${job.progress.processed} items successfully, ${job.progress.failed} errors.`;
+
+                    // Offer all outputs as a single ZIP download
+                    const downloadLink = document.getElementById('batch-download-link');
+                    downloadLink.href = job.archive_url;
+                } else {
+                    alert('Error: ' + (job.error || 'Batch processing failed'));
+                }
             } else {
                 alert('Error: ' + (result.error || 'Unknown error occurred'));
             }
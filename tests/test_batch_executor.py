@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from services.batch_executor import BatchExecutor, synthesize_chunks
+
+
+def test_slow_item_does_not_block_dispatch():
+    started = {}
+
+    def handler(key, value):
+        started[key] = time.monotonic()
+        time.sleep(value)
+        return {'success': True, 'key': key}
+
+    began = time.monotonic()
+    items = [('slow', 0.3)] + [(f'fast{index}', 0.01) for index in range(6)]
+    results = list(BatchExecutor(2).run(items, handler))
+
+    assert [key for key, _ in results] == [key for key, _ in items]
+    # Every fast item ran on the second worker while the slow one was still going
+    assert max(started.values()) - began < 0.2
+
+
+def test_results_are_buffered_up_to_limit():
+    started = []
+
+    def handler(key, value):
+        started.append(key)
+        time.sleep(value)
+        return {'success': True}
+
+    items = [('slow', 0.2)] + [(str(index), 0.0) for index in range(10)]
+    executor = BatchExecutor(2, max_buffered=4)
+    results = executor.run(items, handler)
+    assert next(results)[0] == 'slow'
+    # Dispatch paused with four items held, the slow head among them
+    assert sorted(started) == ['0', '1', '2', 'slow']
+    assert [key for key, _ in results] == [str(index) for index in range(10)]
+
+
+def test_item_timeout():
+    def handler(key, value):
+        time.sleep(value)
+        return {'success': True}
+
+    results = dict(BatchExecutor(2, item_timeout=0.05).run([('slow', 1), ('fast', 0)], handler))
+    assert results['slow'] == {'success': False, 'error': 'Timed out after 0.05 seconds'}
+    assert results['fast'] == {'success': True}
+
+
+def test_input_error_is_raised_after_dispatched_items():
+    def items():
+        yield 'a', 1
+        raise ValueError('bad input')
+
+    results = BatchExecutor(2).run(items(), lambda key, value: {'success': True})
+    assert next(results) == ('a', {'success': True})
+    with pytest.raises(ValueError, match='bad input'):
+        next(results)
+
+
+def test_synthesize_chunks_keeps_order():
+    delays = {'a': 0.05, 'b': 0.0, 'c': 0.02}
+
+    def synthesize(chunk):
+        time.sleep(delays[chunk])
+        return chunk.encode()
+
+    assert synthesize_chunks(['a', 'b', 'c'], synthesize, 3) == [b'a', b'b', b'c']
+
+
+def test_synthesize_chunks_names_failed_chunk():
+    def synthesize(chunk):
+        if chunk == 'b':
+            raise ValueError('bad voice')
+        return chunk.encode()
+
+    with pytest.raises(RuntimeError, match='Chunk 2 of 3: bad voice'):
+        synthesize_chunks(['a', 'b', 'c'], synthesize, 2)
@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+from utils.batch_parser import BatchFormatError, JSONObjectStream, iter_batch_items
+
+DOCUMENTS = [
+    '{}',
+    '  {  }  ',
+    '{"a": "hello"}',
+    '{"a": 12.5, "b": 1e5, "c": -0.25E-3, "d": 7, "e": -12}',
+    '{"n": 12.5}',
+    '{"a": true, "b": false, "c": null}',
+    '{"a": [1, 2.5, {"b": "c"}], "d": {"e": [true, null]}}',
+    '{"quote": "say \\"hi\\"", "unicode": "\\u00e9t\\u00e9 — café", "newline": "a\\nb"}',
+    '{\n  "x": 100,\n  "y": 200.125\n}\n',
+    '{"a":1,"b":22,"c":333,"d":4444.5,"e":55555e-2}',
+]
+
+
+def parse(document, read_size):
+    return list(JSONObjectStream(io.StringIO(document), read_size=read_size))
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('read_size', [1, 2, 3, 5, 7, 64])
+def test_matches_json_loads(document, read_size):
+    assert parse(document, read_size) == list(json.loads(document).items())
+
+
+def test_number_split_at_default_read_size():
+    # The read boundary falls inside 12.5
+    document = '{"s": "' + 'x' * 65518 + '", "n": 12.5}'
+    boundary = JSONObjectStream.READ_SIZE
+    assert document[boundary - 3:boundary] == '12.'
+    assert parse(document, JSONObjectStream.READ_SIZE) == list(json.loads(document).items())
+
+
+@pytest.mark.parametrize('document', [
+    '{"a": 1,}',
+    '{"a" 1}',
+    '{"a": 1 "b": 2}',
+    '{1: 2}',
+    '{"a": 1} extra',
+    '{"a": 12.}',
+    '{"a": ',
+])
+@pytest.mark.parametrize('read_size', [1, 4, 64])
+def test_invalid_json(document, read_size):
+    with pytest.raises(json.JSONDecodeError):
+        parse(document, read_size)
+
+
+@pytest.mark.parametrize('document', ['[1, 2]', '"text"', ''])
+def test_not_an_object(document):
+    with pytest.raises(BatchFormatError):
+        parse(document, 4)
+
+
+def test_iter_batch_items_formats():
+    assert list(iter_batch_items(io.BytesIO(b'\xef\xbb\xbf{"a": "x", "b": "y"}'), 'json')) == [('a', 'x'), ('b', 'y')]
+    assert list(iter_batch_items(io.BytesIO(b'{"a": "x"}\n\n{"b": "y"}\n'), 'jsonl')) == [('a', 'x'), ('b', 'y')]
+    assert list(iter_batch_items(io.BytesIO(b'key,text\na,x\r\nb,"y, z"\n'), 'csv')) == [('a', 'x'), ('b', 'y, z')]
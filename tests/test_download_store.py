@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    # Importing the module creates the default store relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    from services.download_store import DownloadStore
+    return DownloadStore(str(tmp_path / 'downloads'))
+
+
+def test_partial_files_are_outside_shards_and_unindexed(store):
+    partial = store.partial_path('speech.mp3')
+    with open(partial, 'wb') as f:
+        f.write(b'audio')
+    assert store.lookup('speech.mp3') is None
+    assert store.stats()['files'] == 0
+
+    os.replace(partial, store.prepare('speech.mp3'))
+    store.register('speech.mp3')
+    assert store.lookup('speech.mp3') == store.path('speech.mp3')
+
+
+def test_sweep_removes_only_abandoned_partials(store):
+    abandoned = store.partial_path('old.mp3')
+    active = store.partial_path('new.mp3')
+    for path in (abandoned, active):
+        with open(path, 'wb') as f:
+            f.write(b'audio')
+    hour_ago = time.time() - 3600
+    os.utime(abandoned, (hour_ago, hour_ago))
+
+    assert store.sweep_partials(600) == 1
+    assert not os.path.exists(abandoned)
+    assert os.path.exists(active)
+
+
+def test_reap_deletes_expired_files(store):
+    for name, ttl in (('expired.mp3', -1), ('fresh.mp3', 3600)):
+        with open(store.prepare(name), 'wb') as f:
+            f.write(b'audio')
+        store.register(name, ttl)
+    assert store.reap() == 1
+    assert store.lookup('expired.mp3') is None
+    assert store.lookup('fresh.mp3') is not None
@@ -0,0 +1,14 @@
+from services import metrics
+
+
+def test_unknown_region_is_other():
+    assert metrics.region_label('westeurope') == 'westeurope'
+    assert metrics.region_label('attacker-chosen') == metrics.OTHER_LABEL
+    assert metrics.region_label('') == ''
+
+
+def test_only_registered_voices_are_labels():
+    assert metrics.voice_label('voice-not-registered') == metrics.OTHER_LABEL
+    metrics.register_voices(['test-voice'])
+    assert metrics.voice_label('test-voice') == 'test-voice'
+    assert metrics.voice_label(None) == ''
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from services.rate_limiter import (MemoryBucketStore, RateLimiter, RateLimitTimeout, SQLiteBucketStore,
+                                   ThrottledError, wait_deadline)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / 'buckets.sqlite3'))
+
+
+def test_bucket_allows_burst_then_waits(store):
+    now = 100.0
+    assert [store.take('k', 2, 3, now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take('k', 2, 3, now) == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_burst(store):
+    for _ in range(3):
+        store.take('k', 2, 3, 100.0)
+    assert store.take('k', 2, 3, 100.5) == 0.0
+    # A long idle period refills no more than the burst
+    assert [store.take('k', 2, 3, 1000.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take('k', 2, 3, 1000.0) > 0
+
+
+def test_block_holds_back_tokens(store):
+    store.block('k', 110.0)
+    assert store.take('k', 2, 3, 100.0) == pytest.approx(10.0)
+    assert store.take('k', 2, 3, 110.0) == 0.0
+
+
+def test_buckets_are_per_key(store):
+    store.take('a', 1, 1, 100.0)
+    assert store.take('a', 1, 1, 100.0) > 0
+    assert store.take('b', 1, 1, 100.0) == 0.0
+
+
+def test_call_retries_after_throttle(monkeypatch):
+    limiter = RateLimiter({'p': {'rate': 0}}, max_retries=2)
+    blocked = []
+    monkeypatch.setattr(limiter, 'block', lambda provider, api_key, seconds: blocked.append(seconds))
+    attempts = []
+
+    def operation():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ThrottledError('slow down', retry_after=2)
+        return 'ok'
+
+    assert limiter.call('p', 'key', operation) == 'ok'
+    assert blocked == [2, 2]
+
+
+def test_call_backs_off_exponentially_without_retry_after(monkeypatch):
+    limiter = RateLimiter({'p': {'rate': 0}}, max_retries=3)
+    blocked = []
+    monkeypatch.setattr(limiter, 'block', lambda provider, api_key, seconds: blocked.append(seconds))
+
+    def operation():
+        raise ThrottledError('slow down')
+
+    with pytest.raises(ThrottledError):
+        limiter.call('p', 'key', operation)
+    assert blocked == [1.0, 2.0, 4.0]
+
+
+def test_call_does_not_retry_other_errors():
+    limiter = RateLimiter({'p': {'rate': 0}})
+    attempts = []
+
+    def operation():
+        attempts.append(1)
+        raise ValueError('bad')
+
+    with pytest.raises(ValueError):
+        limiter.call('p', 'key', operation)
+    assert len(attempts) == 1
+
+
+def test_wait_times_out_beyond_max_wait():
+    limiter = RateLimiter({'p': {'rate': 0.01, 'burst': 1}}, max_wait=1)
+    limiter.wait('p', 'key')
+    with pytest.raises(RateLimitTimeout):
+        limiter.wait('p', 'key')
+
+
+def test_wait_deadline_caps_max_wait():
+    limiter = RateLimiter({'p': {'rate': 1, 'burst': 1}}, max_wait=120)
+    limiter.wait('p', 'key')
+    started = time.monotonic()
+    with wait_deadline(0.1), pytest.raises(RateLimitTimeout):
+        limiter.wait('p', 'key')
+    assert time.monotonic() - started < 0.5
+
+
+def test_concurrency_cap():
+    limiter = RateLimiter({'p': {'rate': 0, 'concurrency': 2}}, max_wait=0.2)
+    release = threading.Event()
+    entered = threading.Barrier(3)
+
+    def hold():
+        with limiter.acquire('p', 'key'):
+            entered.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    entered.wait()
+    try:
+        with pytest.raises(RateLimitTimeout):
+            with limiter.acquire('p', 'key'):
+                pass
+        # Sessions that take no slot are not held back
+        with limiter.acquire('p', 'key', hold_slot=False):
+            pass
+        # Other keys have their own slots
+        with limiter.acquire('p', 'other'):
+            pass
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_memory_store_drops_least_recently_used_buckets():
+    store = MemoryBucketStore(max_keys=2)
+    store.take('a', 1, 1, 100.0)
+    store.take('b', 1, 1, 100.0)
+    store.take('a', 1, 1, 100.0)
+    store.take('c', 1, 1, 100.0)
+    assert list(store._buckets) == ['a', 'c']
+
+
+def test_sqlite_store_prunes_idle_buckets(tmp_path):
+    store = SQLiteBucketStore(str(tmp_path / 'buckets.sqlite3'), idle_seconds=60)
+    store.take('idle', 1, 1, 100.0)
+    store.take('blocked', 1, 1, 100.0)
+    store.block('blocked', 1000.0)
+    store.prune(500.0)
+    keys = [row[0] for row in store._db.connect().execute('SELECT key FROM buckets')]
+    assert keys == ['blocked']
+
+
+def test_semaphores_are_dropped_only_when_unused():
+    limiter = RateLimiter({'p': {'rate': 0, 'concurrency': 1}}, max_keys=1)
+    with limiter.acquire('p', 'a'):
+        with limiter.acquire('p', 'b'):
+            assert len(limiter._semaphores) == 2
+        # 'a' is still held, so 'b' is the one dropped next
+        with limiter.acquire('p', 'c'):
+            assert len(limiter._semaphores) == 2
+    assert all(entry[1] == 0 for entry in limiter._semaphores.values())
+
+
+def test_strikes_are_bounded():
+    limiter = RateLimiter({'p': {'rate': 0}}, max_keys=2)
+    for api_key in ['a', 'b', 'c']:
+        limiter._throttle_delay('p', api_key, ThrottledError('slow down'))
+    assert len(limiter._strikes) == 2
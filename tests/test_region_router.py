@@ -0,0 +1,34 @@
+import pytest
+
+from services.region_router import RegionRouter
+from services.resilience import ProviderError
+
+
+def test_fails_over_on_transient_error():
+    router = RegionRouter({'eastus': 'key-a', 'westus': 'key-b'})
+    calls = []
+
+    def operation(key, region):
+        calls.append(region)
+        if len(calls) == 1:
+            raise ProviderError('Service unavailable', transient=True)
+        return region
+
+    value, decision = router.call(operation, hedge=False)
+    assert value == calls[1]
+    assert len(decision['attempts']) == 2
+    assert router._outcomes[calls[0]][-1][1] is False
+
+
+def test_permanent_error_is_raised_without_failover():
+    router = RegionRouter({'eastus': 'key-a', 'westus': 'key-b'})
+    calls = []
+
+    def operation(key, region):
+        calls.append(region)
+        raise ProviderError('Bad request')
+
+    with pytest.raises(ProviderError, match='Bad request'):
+        router.call(operation, hedge=False)
+    assert len(calls) == 1
+    assert not router._outcomes[calls[0]]
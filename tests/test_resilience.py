@@ -0,0 +1,135 @@
+import pytest
+
+from services import resilience
+from services.resilience import CircuitBreaker, CircuitOpenError, ProviderError, ProviderGuard
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, 'monotonic', clock)
+    monkeypatch.setattr(resilience.time, 'sleep', lambda seconds: None)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.stats()['state'] == 'closed'
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.stats() == {'name': 'test', 'state': 'open', 'consecutive_failures': 3}
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.stats()['state'] == 'closed'
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.stats()['state'] == 'half_open'
+
+    breaker.before_call()  # The probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.stats()['state'] == 'closed'
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.stats()['state'] == 'open'
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def failing(errors, result='ok'):
+    calls = []
+
+    def operation():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return operation, calls
+
+
+def test_guard_retries_transient_errors(clock):
+    guard = ProviderGuard(CircuitBreaker('test', failure_threshold=5), max_attempts=3)
+    operation, calls = failing([ProviderError('busy', transient=True)] * 2)
+    assert guard.call(operation) == 'ok'
+    assert len(calls) == 3
+    assert guard.breaker.stats()['consecutive_failures'] == 0
+
+
+def test_guard_gives_up_after_max_attempts(clock):
+    guard = ProviderGuard(CircuitBreaker('test', failure_threshold=5), max_attempts=2)
+    operation, calls = failing([ProviderError('busy', transient=True)] * 3)
+    with pytest.raises(ProviderError):
+        guard.call(operation)
+    assert len(calls) == 2
+    assert guard.breaker.stats()['consecutive_failures'] == 2
+
+
+def test_guard_does_not_retry_permanent_errors(clock):
+    guard = ProviderGuard(CircuitBreaker('test', failure_threshold=1), max_attempts=3)
+    operation, calls = failing([ProviderError('bad key')])
+    with pytest.raises(ProviderError):
+        guard.call(operation)
+    assert len(calls) == 1
+    # The provider answered, so the circuit stays closed
+    assert guard.breaker.stats()['state'] == 'closed'
+
+
+def test_guard_stops_retrying_once_open(clock):
+    guard = ProviderGuard(CircuitBreaker('test', failure_threshold=2), max_attempts=5)
+    operation, calls = failing([ProviderError('down', transient=True)] * 5)
+    with pytest.raises(ProviderError):
+        guard.call(operation)
+    assert len(calls) == 2
+    with pytest.raises(CircuitOpenError):
+        guard.call(operation)
+    assert len(calls) == 2
+
+
+def test_guard_record(clock):
+    guard = ProviderGuard(CircuitBreaker('test', failure_threshold=1))
+    guard.record(ProviderError('bad request'))
+    assert guard.breaker.stats()['state'] == 'closed'
+    guard.record(ProviderError('down', transient=True))
+    assert guard.breaker.stats()['state'] == 'open'
+    clock.now += 60
+    guard.record()
+    assert guard.breaker.stats()['state'] == 'closed'
+
+
+def test_guard_scoped_only_by_known_regions():
+    assert resilience.get_guard('azure', 'westeurope').breaker.name == 'azure:westeurope'
+    assert resilience.get_guard('azure', 'not-a-region') is resilience.get_guard('azure')
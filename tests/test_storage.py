@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from services.storage import S3StorageBackend, StorageBackend
+from utils.config import Config
+
+
+class FakeS3Client:
+    """Stands in for a boto3 S3 client, keeping objects in memory"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, filepath, bucket, key, Config=None):
+        with open(filepath, 'rb') as f:
+            self.objects[(bucket, key)] = f.read()
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example.com/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+@pytest.fixture(autouse=True)
+def workdir(monkeypatch, tmp_path):
+    # The download store and app create their directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, 'CLEANUP_INTERVAL', 0)
+
+
+@pytest.fixture
+def backend():
+    return S3StorageBackend('outputs', prefix='downloads/', url_expiry=60, client=FakeS3Client())
+
+
+def test_publish_uploads_under_prefix(backend, tmp_path):
+    filepath = tmp_path / 'speech.mp3'
+    filepath.write_bytes(b'audio')
+    backend.publish('speech.mp3', str(filepath))
+    assert backend.client.objects == {('outputs', 'downloads/speech.mp3'): b'audio'}
+
+
+def test_download_url_is_none_for_missing_object(backend):
+    assert backend.download_url('missing.mp3') is None
+
+
+def test_download_url_presigns_published_object(backend, tmp_path):
+    filepath = tmp_path / 'speech.mp3'
+    filepath.write_bytes(b'audio')
+    backend.publish('speech.mp3', str(filepath))
+    assert backend.download_url('speech.mp3') == 'https://s3.example.com/outputs/downloads/speech.mp3?expires=60'
+
+
+def test_download_url_raises_other_errors(backend):
+    def denied(Bucket, Key):
+        raise ClientError({'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'HeadObject')
+    backend.client.head_object = denied
+    with pytest.raises(ClientError):
+        backend.download_url('speech.mp3')
+
+
+def test_register_publishes_in_background(tmp_path):
+    from services.download_store import DownloadStore
+    published = threading.Event()
+    release = threading.Event()
+
+    class SlowBackend(StorageBackend):
+        publishes = True
+
+        def publish(self, filename, filepath):
+            release.wait(5)
+            published.set()
+
+    store = DownloadStore(str(tmp_path / 'downloads'), backend=SlowBackend())
+    with open(store.prepare('speech.mp3'), 'wb') as f:
+        f.write(b'audio')
+    store.register('speech.mp3')
+    # register() returned while the upload is still blocked
+    assert not published.is_set()
+    release.set()
+    assert published.wait(5)
+
+
+def test_download_redirects_to_presigned_url(backend, monkeypatch, tmp_path):
+    import app as app_module
+    filepath = tmp_path / 'elsewhere.mp3'
+    filepath.write_bytes(b'audio')
+    backend.publish('elsewhere.mp3', str(filepath))
+    app = app_module.create_app()
+    monkeypatch.setattr(app.extensions['orato']['file_service'], 'backend', backend)
+
+    test_client = app.test_client()
+    response = test_client.get('/download/elsewhere.mp3')
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://s3.example.com/outputs/downloads/elsewhere.mp3?expires=60'
+    assert test_client.get('/download/missing.mp3').status_code == 404
@@ -0,0 +1,128 @@
+import struct
+from typing import List, Tuple
+
+
+def parse_wav(data: bytes) -> Tuple[bytes, bytes]:
+    """Split a RIFF/WAVE file into its fmt chunk payload and PCM data"""
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError('Not a RIFF/WAVE file')
+
+    fmt = None
+    position = 12
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        chunk_size = struct.unpack('<I', data[position + 4:position + 8])[0]
+        body_start = position + 8
+        if chunk_id == b'fmt ':
+            fmt = data[body_start:body_start + chunk_size]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('WAV data chunk precedes fmt chunk')
+            # Streamed WAVs may carry a placeholder size; clamp to the buffer
+            return fmt, data[body_start:min(body_start + chunk_size, len(data))]
+        # Chunks are padded to an even number of bytes
+        position = body_start + chunk_size + (chunk_size & 1)
+
+    raise ValueError('WAV file has no data chunk')
+
+
+def read_wav_header(stream, max_header_size: int = 64 * 1024) -> Tuple[bytes, bytes]:
+    """Read a WAV header from a byte stream.
+
+    Returns the fmt chunk payload and any PCM bytes read past the start of
+    the data chunk, leaving the rest of the stream unread.
+    """
+    buffer = b''
+    fmt = None
+    position = 12
+    while True:
+        if len(buffer) >= 12 and (buffer[:4] != b'RIFF' or buffer[8:12] != b'WAVE'):
+            raise ValueError('Not a RIFF/WAVE file')
+        while len(buffer) >= 12 and position + 8 <= len(buffer):
+            chunk_id = buffer[position:position + 4]
+            chunk_size = struct.unpack('<I', buffer[position + 4:position + 8])[0]
+            body_start = position + 8
+            if chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError('WAV data chunk precedes fmt chunk')
+                return fmt, buffer[body_start:]
+            if body_start + chunk_size > len(buffer):
+                break
+            if chunk_id == b'fmt ':
+                fmt = buffer[body_start:body_start + chunk_size]
+            position = body_start + chunk_size + (chunk_size & 1)
+
+        if len(buffer) > max_header_size:
+            raise ValueError('WAV header too large')
+        chunk = stream.read(4096)
+        if not chunk:
+            raise ValueError('WAV file has no data chunk')
+        buffer += chunk
+
+
+def pcm_wav_format(sample_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """Build the fmt chunk payload for integer PCM audio"""
+    block_align = channels * bits_per_sample // 8
+    return struct.pack('<HHIIHH', 1, channels, sample_rate, sample_rate * block_align,
+                       block_align, bits_per_sample)
+
+
+def build_wav(fmt: bytes, pcm: bytes) -> bytes:
+    """Build a RIFF/WAVE file from a fmt chunk payload and PCM data"""
+    return b''.join([
+        b'RIFF', struct.pack('<I', 4 + 8 + len(fmt) + 8 + len(pcm)), b'WAVE',
+        b'fmt ', struct.pack('<I', len(fmt)), fmt,
+        b'data', struct.pack('<I', len(pcm)), pcm
+    ])
+
+
+def concat_wav(parts: List[bytes]) -> bytes:
+    """Concatenate WAV files with identical formats into a single WAV file"""
+    fmt = None
+    pcm = []
+    for part in parts:
+        part_fmt, part_pcm = parse_wav(part)
+        if fmt is None:
+            fmt = part_fmt
+        elif part_fmt != fmt:
+            raise ValueError('Cannot concatenate WAV files with different formats')
+        pcm.append(part_pcm)
+    if fmt is None:
+        raise ValueError('No audio to concatenate')
+    return build_wav(fmt, b''.join(pcm))
+
+
+def split_wav(data: bytes, offsets: List[float]) -> List[bytes]:
+    """Split a WAV file into one WAV file per start offset (in seconds).
+
+    Each piece runs from its offset to the next one; the last runs to the
+    end of the audio.
+    """
+    fmt, pcm = parse_wav(data)
+    byte_rate, block_align = struct.unpack('<IH', fmt[8:14])
+    block_align = max(block_align, 1)
+
+    positions = []
+    for offset in offsets:
+        position = int(offset * byte_rate) // block_align * block_align
+        positions.append(min(max(position, 0), len(pcm)))
+    positions.append(len(pcm))
+
+    return [build_wav(fmt, pcm[start:max(start, end)]) for start, end in zip(positions, positions[1:])]
+
+
+def strip_id3(data: bytes) -> bytes:
+    """Remove ID3v2 (leading) and ID3v1 (trailing) tags from MP3 data"""
+    if data[:3] == b'ID3' and len(data) >= 10:
+        # Tag size is a 28-bit synchsafe integer, plus an optional footer
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+
+def concat_mp3(parts: List[bytes]) -> bytes:
+    """Concatenate MP3 streams by joining their frames"""
+    return b''.join(strip_id3(part) for part in parts)
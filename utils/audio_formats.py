@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional
+from utils.audio import build_wav, concat_mp3, concat_wav, pcm_wav_format
+
+
+class AudioFormatError(ValueError):
+    """Raised for an unknown output format or one the provider cannot produce"""
+
+
+# Output formats by name. Each maps to an Azure SpeechSynthesisOutputFormat
+# member and an ElevenLabs output_format, or None where the provider has no
+# equivalent. ElevenLabs returns raw PCM, which is wrapped in a WAV header.
+AUDIO_FORMATS = {
+    'wav-8khz': {'container': 'wav', 'sample_rate': 8000,
+                 'azure': 'Riff8Khz16BitMonoPcm', 'elevenlabs': None},
+    'wav-16khz': {'container': 'wav', 'sample_rate': 16000,
+                  'azure': 'Riff16Khz16BitMonoPcm', 'elevenlabs': 'pcm_16000'},
+    'wav-22khz': {'container': 'wav', 'sample_rate': 22050,
+                  'azure': 'Riff22050Hz16BitMonoPcm', 'elevenlabs': 'pcm_22050'},
+    'wav-24khz': {'container': 'wav', 'sample_rate': 24000,
+                  'azure': 'Riff24Khz16BitMonoPcm', 'elevenlabs': 'pcm_24000'},
+    'wav-44khz': {'container': 'wav', 'sample_rate': 44100,
+                  'azure': 'Riff44100Hz16BitMonoPcm', 'elevenlabs': 'pcm_44100'},
+    'wav-48khz': {'container': 'wav', 'sample_rate': 48000,
+                  'azure': 'Riff48Khz16BitMonoPcm', 'elevenlabs': None},
+    'mp3-32k': {'container': 'mp3', 'azure': 'Audio16Khz32KBitRateMonoMp3', 'elevenlabs': 'mp3_22050_32'},
+    'mp3-48k': {'container': 'mp3', 'azure': 'Audio24Khz48KBitRateMonoMp3', 'elevenlabs': None},
+    'mp3-64k': {'container': 'mp3', 'azure': 'Audio16Khz64KBitRateMonoMp3', 'elevenlabs': 'mp3_44100_64'},
+    'mp3-96k': {'container': 'mp3', 'azure': 'Audio24Khz96KBitRateMonoMp3', 'elevenlabs': 'mp3_44100_96'},
+    'mp3-128k': {'container': 'mp3', 'azure': 'Audio16Khz128KBitRateMonoMp3', 'elevenlabs': 'mp3_44100_128'},
+    'mp3-160k': {'container': 'mp3', 'azure': 'Audio24Khz160KBitRateMonoMp3', 'elevenlabs': None},
+    'mp3-192k': {'container': 'mp3', 'azure': 'Audio48Khz192KBitRateMonoMp3', 'elevenlabs': 'mp3_44100_192'},
+    'ogg-16khz': {'container': 'ogg', 'azure': 'Ogg16Khz16BitMonoOpus', 'elevenlabs': None},
+    'ogg-24khz': {'container': 'ogg', 'azure': 'Ogg24Khz16BitMonoOpus', 'elevenlabs': None},
+    'ogg-48khz': {'container': 'ogg', 'azure': 'Ogg48Khz16BitMonoOpus', 'elevenlabs': None},
+}
+
+# Shorthand names
+AUDIO_FORMAT_ALIASES = {'wav': 'wav-16khz', 'mp3': 'mp3-128k', 'ogg': 'ogg-24khz', 'opus': 'ogg-24khz'}
+
+# What each provider produced before formats were selectable
+DEFAULT_AUDIO_FORMATS = {'azure': 'wav-16khz', 'elevenlabs': 'mp3-128k'}
+
+
+def get_audio_format(name: Optional[str], provider: str) -> Dict:
+    """Look up an output format for a provider, defaulting to the provider's usual format"""
+    name = (name or DEFAULT_AUDIO_FORMATS[provider]).lower()
+    name = AUDIO_FORMAT_ALIASES.get(name, name)
+    spec = AUDIO_FORMATS.get(name)
+    if spec is None:
+        raise AudioFormatError(f'Invalid output format. Expected one of: {", ".join(supported_formats(provider))}')
+    if spec[provider] is None:
+        raise AudioFormatError(f'{provider} does not support the {name} output format')
+    return {'name': name, 'extension': spec['container'], **spec}
+
+
+def supported_formats(provider: str) -> List[str]:
+    """List the output formats a provider can produce"""
+    return [name for name, spec in AUDIO_FORMATS.items() if spec[provider] is not None]
+
+
+def concat_audio(audio_format: Dict, parts: List[bytes]) -> bytes:
+    """Join audio files of the same output format into one"""
+    if audio_format['container'] == 'wav':
+        return concat_wav(parts)
+    if audio_format['container'] == 'mp3':
+        return concat_mp3(parts)
+    # Back-to-back Ogg streams form a valid chained Ogg file
+    return b''.join(parts)
+
+
+def pcm_to_wav(audio_format: Dict, pcm: bytes) -> bytes:
+    """Wrap raw 16-bit mono PCM in a WAV header for the format's sample rate"""
+    return build_wav(pcm_wav_format(audio_format['sample_rate']), pcm)
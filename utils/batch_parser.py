@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+import os
+from typing import Any, Iterator, Optional, Tuple
+
+BATCH_FORMATS = ('json', 'jsonl', 'csv')
+
+
+class BatchFormatError(ValueError):
+    """Raised when a batch file does not have the expected structure"""
+
+
+def detect_batch_format(filename: Optional[str]) -> str:
+    """Guess the batch input format from a filename"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def iter_batch_items(file, input_format: str = 'json') -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) pairs from a binary batch file as they are parsed.
+
+    Supported formats:
+      json  - a single object of key/value pairs
+      jsonl - one object of key/value pairs per line
+      csv   - two columns (key, value), with an optional "key" header row
+    """
+    if input_format not in BATCH_FORMATS:
+        raise BatchFormatError(f'Unsupported batch format: {input_format}')
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='' if input_format == 'csv' else None)
+    try:
+        if input_format == 'jsonl':
+            yield from _iter_json_lines(text)
+        elif input_format == 'csv':
+            yield from _iter_csv(text)
+        else:
+            yield from JSONObjectStream(text)
+    finally:
+        # Leave the underlying file open for its owner
+        text.detach()
+
+
+class JSONObjectStream:
+    """Incremental parser for a top-level JSON object of key/value pairs.
+
+    Only the pair being parsed is held in memory: each value is decoded with
+    ``JSONDecoder.raw_decode`` as soon as enough input has been read, and
+    consumed input is discarded.
+    """
+
+    READ_SIZE = 64 * 1024
+    NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+    def __init__(self, text, read_size: int = READ_SIZE):
+        self.text = text
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        if self._peek() != '{':
+            raise BatchFormatError('Invalid JSON format. Expected object with key-value pairs.')
+        self.pos += 1
+
+        if self._peek() == '}':
+            self.pos += 1
+        else:
+            while True:
+                key = self._value()
+                if not isinstance(key, str):
+                    self._error('Expecting property name enclosed in double quotes')
+                self._expect(':')
+                yield key, self._value()
+
+                separator = self._peek()
+                self.pos += 1
+                if separator == '}':
+                    break
+                if separator != ',':
+                    self.pos -= 1
+                    self._error("Expecting ',' delimiter")
+
+        if self._peek() is not None:
+            self._error('Extra data')
+
+    def _fill(self, size: int) -> bool:
+        """Read more input, dropping the consumed part of the buffer"""
+        if self.eof:
+            return False
+        chunk = self.text.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> Optional[str]:
+        """Skip whitespace and return the next character, or None at the end"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.read_size):
+                return None
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            self._error(f"Expecting '{char}' delimiter")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        """Decode the next JSON value, reading more input until it is complete"""
+        if self._peek() is None:
+            self._error('Expecting value')
+        read_size = self.read_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number may continue in the next read, e.g. "12." + "5"
+                if self.eof or not self._is_partial_number(value, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads geometrically so large values are not re-scanned too often
+            self._fill(read_size)
+            read_size *= 2
+
+    def _is_partial_number(self, value: Any, end: int) -> bool:
+        """Whether a decoded number is followed only by characters that could extend it"""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return all(char in self.NUMBER_CHARS for char in self.buffer[end:])
+
+    def _error(self, message: str):
+        raise json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def _iter_json_lines(text) -> Iterator[Tuple[str, Any]]:
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchFormatError(f'Invalid JSON on line {line_number}: {e}')
+        if not isinstance(item, dict):
+            raise BatchFormatError(f'Line {line_number}: expected object with key-value pairs')
+        yield from item.items()
+
+
+def _iter_csv(text) -> Iterator[Tuple[str, Any]]:
+    for row_number, row in enumerate(csv.reader(text), 1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if row_number == 1 and row[0].strip().lower() == 'key':
+            continue
+        if len(row) < 2:
+            raise BatchFormatError(f'Row {row_number}: expected key and value columns')
+        yield row[0], row[1]
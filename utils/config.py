@@ -1,6 +1,15 @@
 import os
 from typing import Dict, List
 
+def _parse_region_keys(value: str) -> Dict[str, str]:
+    """Parse "region=key,region=key" into a dict of keys by region"""
+    region_keys = {}
+    for entry in value.split(','):
+        region, _, key = entry.partition('=')
+        if region.strip() and key.strip():
+            region_keys[region.strip()] = key.strip()
+    return region_keys
+
 class Config:
     """Configuration class for Orato application"""
     
@@ -36,14 +45,114 @@ class Config:
         'brazil', 'canada', 'europe', 'global', 'india', 'japan', 'uk'
     ]
     
+    # Region routing: keys we hold per region, used when a request asks for region "auto"
+    AZURE_REGION_KEYS = _parse_region_keys(os.getenv('AZURE_REGION_KEYS', ''))
+    AZURE_ROUTING_WINDOW = int(os.getenv('AZURE_ROUTING_WINDOW', 50))  # Recent calls tracked per region
+    AZURE_ROUTING_ERROR_THRESHOLD = float(os.getenv('AZURE_ROUTING_ERROR_THRESHOLD', 0.5))
+    AZURE_ROUTING_COOLDOWN = float(os.getenv('AZURE_ROUTING_COOLDOWN', 30))  # Seconds an unhealthy region is avoided
+    AZURE_ROUTING_MAX_ATTEMPTS = int(os.getenv('AZURE_ROUTING_MAX_ATTEMPTS', 2))  # Regions tried per call
+    AZURE_HEDGE_DELAY = float(os.getenv('AZURE_HEDGE_DELAY', 0))  # Seconds before hedging short calls to the next region, 0 disables
+    
     # File upload settings
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = {'wav', 'mp3', 'mp4', 'm4a', 'ogg', 'flac', 'json'}
+    STT_STREAM_CHUNK_SIZE = 32 * 1024  # Bytes read from streamed STT uploads at a time
+    
+    # Batch processing settings
+    BATCH_WORKERS = {
+        'azure': int(os.getenv('AZURE_BATCH_WORKERS', 8)),
+        'elevenlabs': int(os.getenv('ELEVENLABS_BATCH_WORKERS', 4))
+    }
+    BATCH_ITEM_TIMEOUT = float(os.getenv('BATCH_ITEM_TIMEOUT', 60))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # Batch jobs run concurrently per process
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 10))  # Seconds between job liveness writes
+    JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 60))  # Silence after which an unfinished job has failed
+    
+    # Provider rate limits per API key: requests per second, burst size and
+    # concurrent requests (0 disables a limit)
+    RATE_LIMITS = {
+        'azure': {
+            'rate': float(os.getenv('AZURE_RATE_LIMIT', 20)),
+            'burst': float(os.getenv('AZURE_RATE_BURST', 20)),
+            'concurrency': int(os.getenv('AZURE_MAX_CONCURRENCY', 16))
+        },
+        'elevenlabs': {
+            'rate': float(os.getenv('ELEVENLABS_RATE_LIMIT', 5)),
+            'burst': float(os.getenv('ELEVENLABS_RATE_BURST', 5)),
+            'concurrency': int(os.getenv('ELEVENLABS_MAX_CONCURRENCY', 4))
+        }
+    }
+    RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 120))  # Seconds a call may queue
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', 3))  # Retries after a 429
+    RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', '')  # sqlite path to share buckets across workers
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 4096))  # API keys tracked per worker before the least recent are dropped
+    
+    # Retries of transient provider failures and circuit breaking
+    PROVIDER_RETRY_ATTEMPTS = int(os.getenv('PROVIDER_RETRY_ATTEMPTS', 3))
+    PROVIDER_RETRY_BASE_DELAY = float(os.getenv('PROVIDER_RETRY_BASE_DELAY', 0.5))  # Seconds, doubled per attempt
+    PROVIDER_RETRY_MAX_DELAY = float(os.getenv('PROVIDER_RETRY_MAX_DELAY', 8))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))  # Consecutive failures to open
+    CIRCUIT_RECOVERY_SECONDS = float(os.getenv('CIRCUIT_RECOVERY_SECONDS', 30))  # Open time before a probe
+    
+    # Long text synthesis settings
+    TTS_CHUNK_CHARS = int(os.getenv('TTS_CHUNK_CHARS', 2000))  # Texts longer than this are split
+    TTS_CHUNK_WORKERS = int(os.getenv('TTS_CHUNK_WORKERS', 4))  # Chunks synthesized concurrently per text
+    
+    # SSML packing of short batch items (Azure)
+    TTS_PACK_MAX_ITEMS = int(os.getenv('TTS_PACK_MAX_ITEMS', 50))  # Items synthesized per request
+    TTS_PACK_MAX_CHARS = int(os.getenv('TTS_PACK_MAX_CHARS', 3000))  # Total characters per request
+    TTS_PACK_ITEM_MAX_CHARS = int(os.getenv('TTS_PACK_ITEM_MAX_CHARS', 200))  # Longer items are not packed
+    
+    # TTS result cache settings
+    TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'True').lower() == 'true'
+    TTS_CACHE_MAX_ENTRIES = int(os.getenv('TTS_CACHE_MAX_ENTRIES', 10000))
+    TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB
+    TTS_CACHE_MAX_AGE_HOURS = float(os.getenv('TTS_CACHE_MAX_AGE_HOURS', 24))
+    TTS_CACHE_SECRET = os.getenv('TTS_CACHE_SECRET', '')  # Keys output names; set the same value on every replica
+    TTS_CACHE_SECRET_PATH = os.getenv('TTS_CACHE_SECRET_PATH', 'downloads/.cache_secret')  # Generated when no secret is set
+    
+    # Azure speech client pool settings
+    SPEECH_POOL_MAX_SIZE = int(os.getenv('SPEECH_POOL_MAX_SIZE', 32))
+    SPEECH_POOL_IDLE_SECONDS = float(os.getenv('SPEECH_POOL_IDLE_SECONDS', 300))
+    SPEECH_POOL_PRECONNECT = os.getenv('SPEECH_POOL_PRECONNECT', 'True').lower() == 'true'
+    
+    # ElevenLabs client settings
+    ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io/v1')
+    ELEVENLABS_POOL_SIZE = int(os.getenv('ELEVENLABS_POOL_SIZE', 16))  # Connections per API key
+    ELEVENLABS_TIMEOUT = float(os.getenv('ELEVENLABS_TIMEOUT', 60))
+    
+    # Voice catalog cache
+    VOICE_CATALOG_TTL = float(os.getenv('VOICE_CATALOG_TTL', 3600))  # Seconds a catalog is fresh
+    VOICE_CATALOG_STALE_SECONDS = float(os.getenv('VOICE_CATALOG_STALE_SECONDS', 24 * 3600))  # Served stale while refreshing
+    VOICE_CATALOG_MAX_ENTRIES = int(os.getenv('VOICE_CATALOG_MAX_ENTRIES', 256))
+    
+    # Download settings
+    DOWNLOAD_MAX_AGE = int(os.getenv('DOWNLOAD_MAX_AGE', 365 * 24 * 3600))  # Cache lifetime for outputs
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '').lower()  # '', 'nginx' or 'sendfile'
+    DOWNLOAD_OFFLOAD_PREFIX = os.getenv('DOWNLOAD_OFFLOAD_PREFIX', '/protected-downloads/')
+    DOWNLOAD_TTL_HOURS = float(os.getenv('DOWNLOAD_TTL_HOURS', 24))  # Outputs are deleted after this
+    DOWNLOAD_SHARD_DEPTH = int(os.getenv('DOWNLOAD_SHARD_DEPTH', 2))  # Levels of 256 subdirectories
+    DOWNLOAD_INDEX_PATH = os.getenv('DOWNLOAD_INDEX_PATH', os.path.join('downloads', '.index.sqlite3'))
+    CLEANUP_INTERVAL = float(os.getenv('CLEANUP_INTERVAL', 300))  # Seconds between reaper runs; 0 disables
+    
+    # Storage backend for outputs: 'local', or 's3' to share them across replicas
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local').lower()
+    S3_BUCKET = os.getenv('S3_BUCKET', '')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'downloads/')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')  # e.g. http://minio:9000
+    S3_REGION = os.getenv('S3_REGION', '')
+    S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID', '')  # Empty uses the default AWS credential chain
+    S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY', '')
+    S3_URL_EXPIRY = int(os.getenv('S3_URL_EXPIRY', 3600))  # Lifetime of presigned download URLs
+    S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNK_SIZE = int(os.getenv('S3_MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024))
+    DOWNLOAD_PUBLISH_WORKERS = int(os.getenv('DOWNLOAD_PUBLISH_WORKERS', 4))  # Background uploads per worker process
     
     # Application settings
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     HOST = os.getenv('FLASK_HOST', '0.0.0.0')
     PORT = int(os.getenv('FLASK_PORT', 5000))
+    PRELOAD_PROVIDERS = os.getenv('PRELOAD_PROVIDERS', 'False').lower() == 'true'  # Load provider SDKs at boot, not on first use
     
     @classmethod
     def get_language_name(cls, code: str) -> str:
@@ -55,6 +164,11 @@ class Config:
         """Get Azure language code by language code"""
         return cls.LANGUAGES.get(code, {}).get('code', 'en-US')
     
+    @classmethod
+    def get_batch_workers(cls, provider: str) -> int:
+        """Get the number of concurrent batch workers for a provider"""
+        return cls.BATCH_WORKERS.get(provider, 1)
+    
     @classmethod
     def get_supported_languages(cls) -> List[Dict]:
         """Get list of supported languages"""
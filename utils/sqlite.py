@@ -0,0 +1,42 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+
+class SQLiteDatabase:
+    """A sqlite database shared by threads and worker processes.
+
+    Each thread gets its own autocommit connection, opened on first use
+    with the given pragmas. Writes go through ``transaction``, which takes
+    the write lock up front so concurrent writers queue on it instead of
+    failing to upgrade a read lock.
+    """
+
+    def __init__(self, path: str, pragmas: Iterable[str] = (), timeout: float = 10):
+        self.path = path
+        self.pragmas = list(pragmas)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            for pragma in self.pragmas:
+                connection.execute(f'PRAGMA {pragma}')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in an immediate transaction, rolling back if it raises"""
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
@@ -0,0 +1,71 @@
+import re
+from typing import List
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?;:。！？؟।])\s+')
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split text into chunks of at most max_chars characters.
+
+    Paragraph and sentence boundaries are preferred; sentences longer than
+    max_chars fall back to word boundaries, and single words longer than
+    max_chars are cut. Chunks are returned in reading order.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        sentences = [sentence for sentence in SENTENCE_END.split(paragraph) if sentence]
+        for sentence in sentences:
+            if len(sentence) <= max_chars:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_split_words(sentence, max_chars))
+        pieces.append(None)  # paragraph boundary
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if piece is None:
+            # Prefer ending a chunk at a paragraph break once it is half full
+            if len(current) >= max_chars // 2:
+                chunks.append(current)
+                current = ''
+            continue
+        if current and len(current) + 1 + len(piece) <= max_chars:
+            current = f'{current} {piece}'
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_words(sentence: str, max_chars: int) -> List[str]:
+    """Split an over-long sentence on whitespace, cutting over-long words"""
+    parts = []
+    current = ''
+    for word in sentence.split(' '):
+        while len(word) > max_chars:
+            if current:
+                parts.append(current)
+                current = ''
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) <= max_chars:
+            current = f'{current} {word}'
+        else:
+            if current:
+                parts.append(current)
+            current = word
+    if current:
+        parts.append(current)
+    return parts
@@ -0,0 +1,70 @@
+import os
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+
+class _ZipStreamBuffer:
+    """Write-only, non-seekable sink that collects bytes written by ZipFile"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        """Yield the bytes written since the last drain, if any"""
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks = []
+            yield data
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], extra: Iterable[Tuple[str, bytes]] = (),
+               chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield a ZIP archive of (arcname, filepath) pairs without staging it on disk.
+
+    Entries are stored uncompressed, since audio outputs do not compress
+    further. Because the output is not seekable, sizes and CRCs are written
+    in data descriptors after each entry. ``extra`` adds in-memory entries.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, filepath in files:
+            info = zipfile.ZipInfo.from_file(filepath, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            force_zip64 = info.file_size > zipfile.ZIP64_LIMIT
+            with open(filepath, 'rb') as source, archive.open(info, 'w', force_zip64=force_zip64) as target:
+                while True:
+                    block = source.read(chunk_size)
+                    if not block:
+                        break
+                    target.write(block)
+                    yield from buffer.drain()
+            yield from buffer.drain()
+
+        for arcname, data in extra:
+            archive.writestr(arcname, data)
+            yield from buffer.drain()
+
+    yield from buffer.drain()
+
+
+def unique_arcname(name: str, extension: str, used: set) -> str:
+    """Build a safe, unique archive member name ending in the given extension"""
+    name = name.replace('\\', '_').replace('/', '_').lstrip('.') or 'item'
+    if os.path.splitext(name)[1].lower() != extension.lower():
+        name = f'{name}{extension}'
+
+    candidate = name
+    stem, ext = os.path.splitext(name)
+    counter = 2
+    while candidate in used:
+        candidate = f'{stem} ({counter}){ext}'
+        counter += 1
+    used.add(candidate)
+    return candidate